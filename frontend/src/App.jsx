@@ -4,14 +4,14 @@ import ProcessingStatus from './components/ProcessingStatus';
 import VideoPreview from './components/VideoPreview';
 import ActionButtons from './components/ActionButtons';
 import { generateVideo } from './api/client';
-import { useJobPolling } from './hooks/useJobPolling';
+import { useJobEvents } from './hooks/useJobEvents';
 
 function App() {
   const [jobId, setJobId] = useState(null);
   const [error, setError] = useState(null);
   const [darkMode, setDarkMode] = useState(false);
 
-  const { status: jobStatus, error: pollingError } = useJobPolling(jobId);
+  const { status: jobStatus, error: pollingError } = useJobEvents(jobId);
 
   useEffect(() => {
     if (pollingError) setError(pollingError);
@@ -27,3 +27,26 @@ export async function getJobStatus(jobId) {
 
     return response.json();
 }
+
+// Subscribe to server-sent progress events for a job.
+// Calls onStatus with each status payload; returns a function that closes the stream.
+export function subscribeToJob(jobId, { onStatus, onError }) {
+    const source = new EventSource(`${API_BASE}/jobs/${jobId}/events`);
+
+    source.addEventListener('status', (event) => {
+        const status = JSON.parse(event.data);
+        onStatus(status);
+        if (status.status === 'completed' || status.status === 'failed') {
+            source.close();
+        }
+    });
+
+    source.onerror = () => {
+        // EventSource retries transient errors itself; CLOSED means it gave up
+        if (source.readyState === EventSource.CLOSED) {
+            onError(new Error('Lost connection to job event stream'));
+        }
+    };
+
+    return () => source.close();
+}
@@ -7,9 +7,13 @@ const STAGES = [
     { key: 'rendering', label: 'Building & rendering video' },
 ];
 
+// Render milestones reported while Cline works, shown under the rendering step
+const RENDER_SUBSTAGES = ['coding', 'encoding', 'finalizing'];
+
 // Map backend stage to step index
 function stageToIndex(stage) {
-    const idx = STAGES.findIndex((s) => s.key === stage);
+    const key = RENDER_SUBSTAGES.includes(stage) ? 'rendering' : stage;
+    const idx = STAGES.findIndex((s) => s.key === key);
     return idx >= 0 ? idx : -1;
 }
 
@@ -0,0 +1,69 @@
+import { useState, useEffect } from 'react';
+import { getJobStatus, subscribeToJob } from '../api/client';
+
+// Follows a job over server-sent events, falling back to polling
+// /status when EventSource is unavailable or the stream fails.
+export function useJobEvents(jobId, pollInterval = 2000) {
+    const [status, setStatus] = useState(null);
+    const [error, setError] = useState(null);
+    const [isPolling, setIsPolling] = useState(false);
+
+    useEffect(() => {
+        if (!jobId) return;
+
+        let timeoutId;
+        let unsubscribe;
+        let mounted = true;
+
+        const isFinished = (result) =>
+            result.status === 'completed' || result.status === 'failed';
+
+        const poll = async () => {
+            try {
+                const result = await getJobStatus(jobId);
+
+                if (!mounted) return;
+
+                setStatus(result);
+
+                if (isFinished(result)) {
+                    setIsPolling(false);
+                } else {
+                    timeoutId = setTimeout(poll, pollInterval);
+                }
+            } catch (err) {
+                if (!mounted) return;
+                setError(err.message);
+                setIsPolling(false);
+            }
+        };
+
+        setIsPolling(true);
+        setError(null);
+
+        if (typeof EventSource === 'undefined') {
+            poll();
+        } else {
+            unsubscribe = subscribeToJob(jobId, {
+                onStatus: (result) => {
+                    if (!mounted) return;
+                    setStatus(result);
+                    if (isFinished(result)) setIsPolling(false);
+                },
+                onError: () => {
+                    if (!mounted) return;
+                    poll();
+                },
+            });
+        }
+
+        return () => {
+            mounted = false;
+            clearTimeout(timeoutId);
+            if (unsubscribe) unsubscribe();
+            setIsPolling(false);
+        };
+    }, [jobId, pollInterval]);
+
+    return { status, error, isPolling };
+}
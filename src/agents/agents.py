@@ -1,8 +1,11 @@
 import json
 import os
+import threading
+from collections import OrderedDict
 from openai import OpenAI
 from pydantic import BaseModel
 from .schemas import AnalystOutput, DirectorOutput, ShowcaseProps, VideoStoryboard
+from src.cache import DiskCache, cache_key
 import sys
 
 # Load env
@@ -18,6 +21,82 @@ def get_client():
     return _client
 
 
+# Response cache: identical (model, prompts, schema) requests return the stored
+# parsed object instead of a fresh completion. Memory tier in front of disk.
+LLM_CACHE = os.environ.get("LLM_CACHE", "1") == "1"
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_memory_cache: OrderedDict[str, BaseModel] = OrderedDict()
+_memory_lock = threading.Lock()
+_memory_hits = 0
+_disk_cache = DiskCache(
+    "llm",
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    suffix=".json",
+)
+
+
+def llm_cache_stats() -> dict:
+    """Hit/miss counters for the LLM response cache (this process)."""
+    with _memory_lock:
+        return {"memory_hits": _memory_hits, "disk": _disk_cache.stats()}
+
+
+def _remember(key: str, parsed: BaseModel):
+    with _memory_lock:
+        _memory_cache[key] = parsed
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > LLM_CACHE_MEMORY_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def _parse_cached(model: str, system_prompt: str, user_content: str, response_format):
+    """
+    Structured-output completion through the response cache.
+    Returns (parsed, raw_content); parsed is None if the model returned nothing.
+    """
+    global _memory_hits
+    schema_hash = cache_key(response_format.model_json_schema())
+    key = cache_key(model, system_prompt, user_content, schema_hash)
+
+    if LLM_CACHE:
+        with _memory_lock:
+            parsed = _memory_cache.get(key)
+            if parsed is not None:
+                _memory_cache.move_to_end(key)
+                _memory_hits += 1
+        if parsed is None:
+            data = _disk_cache.get_json(key)
+            if data is not None:
+                try:
+                    parsed = response_format.model_validate(data)
+                    _remember(key, parsed)
+                except ValueError:
+                    parsed = None
+        if parsed is not None:
+            print(f"[agents] LLM cache hit ({response_format.__name__})")
+            # Hand out a copy so callers can't mutate the cached object
+            return parsed.model_copy(deep=True), parsed.model_dump_json()
+
+    completion = get_client().beta.chat.completions.parse(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        response_format=response_format,
+    )
+    message = completion.choices[0].message
+    parsed = message.parsed
+    if parsed is not None and LLM_CACHE:
+        _remember(key, parsed.model_copy(deep=True))
+        _disk_cache.put_json(key, parsed.model_dump(mode="json"))
+    return parsed, message.content or ""
+
+
 class Agents:
     
     @staticmethod
@@ -33,15 +112,7 @@ class Agents:
         system_prompt = "You are a Senior Tech Journalist. Extract the core value proposition from this hackathon project. Ignore marketing fluff. Focus on the Problem (Hook), Solution, and Tech Stack."
         
         try:
-            completion = get_client().beta.chat.completions.parse(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": context_str},
-                ],
-                response_format=AnalystOutput,
-            )
-            parsed = completion.choices[0].message.parsed
+            parsed, _ = _parse_cached("gpt-4o", system_prompt, context_str, AnalystOutput)
             if not parsed:
                 raise ValueError("Analyst returned no content")
             return parsed
@@ -51,15 +122,13 @@ class Agents:
             if "context_length_exceeded" in str(e) or "400" in str(e):
                  print("Retrying with truncated context...")
                  truncated = context_str[:10000]
-                 completion = get_client().beta.chat.completions.parse(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are a Senior Tech Journalist. Extract the core value proposition."},
-                        {"role": "user", "content": truncated},
-                    ],
-                    response_format=AnalystOutput,
+                 parsed, _ = _parse_cached(
+                    "gpt-4o",
+                    "You are a Senior Tech Journalist. Extract the core value proposition.",
+                    truncated,
+                    AnalystOutput,
                 )
-                 return completion.choices[0].message.parsed
+                 return parsed
             raise e
 
     @staticmethod
@@ -104,19 +173,10 @@ Generate the JSON configuration based on the provided Analysis.
         
         user_content = f"Project Title: {project_title}\n\nAnalysis: {analysis.model_dump_json()}\n\nAvailable Images: {available_images}"
         
-        completion = get_client().beta.chat.completions.parse(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content},
-            ],
-            response_format=DirectorOutput,
-        )
-        
-        parsed = completion.choices[0].message.parsed
+        parsed, raw_content = _parse_cached("gpt-4o", system_prompt, user_content, DirectorOutput)
         # Save debug
         with open("outputs/last_director_response.json", "w") as f:
-            f.write(completion.choices[0].message.content or "")
+            f.write(raw_content)
 
         return parsed
 
@@ -216,21 +276,12 @@ Key Features:
 Available Images:
 {images_str}"""
 
-        completion = get_client().beta.chat.completions.parse(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content},
-            ],
-            response_format=VideoStoryboard,
-        )
-
-        parsed = completion.choices[0].message.parsed
+        parsed, raw_content = _parse_cached("gpt-4o", system_prompt, user_content, VideoStoryboard)
         if not parsed:
             raise ValueError("Creative Director returned no storyboard")
 
         # Save debug
         with open("outputs/last_storyboard.json", "w") as f:
-            f.write(completion.choices[0].message.content or "")
+            f.write(raw_content)
 
         return parsed
@@ -2,20 +2,68 @@
 elevenlabs.py - Simple ElevenLabs TTS API client.
 
 Generates MP3 voiceover audio from text using the ElevenLabs REST API.
+Audio is cached on disk, keyed on the text, voice, model and voice settings,
+so re-rendering the same storyboard costs no TTS calls.
+
+API requests from every job in the process share ELEVENLABS_CONCURRENCY
+slots, so concurrent renders stay within the plan's request limit. Cache
+hits don't take a slot. Requests rejected with 429 are retried with backoff.
 """
 
 import os
-import requests
+import time
+import random
+import threading
+
+from src.cache import DiskCache, cache_key, link_or_copy
+from src.httpclient import get_session
 
 ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY", "")
 ELEVENLABS_VOICE_ID = os.environ.get("ELEVENLABS_VOICE_ID", "EXAVITQu4vr4xnSDxMaL")
 ELEVENLABS_MODEL = "eleven_turbo_v2_5"
 ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+}
+
+# Concurrent TTS requests per process; keep within the ElevenLabs plan's limit
+ELEVENLABS_CONCURRENCY = int(os.environ.get("ELEVENLABS_CONCURRENCY", "3"))
+# Retries of a request rejected with 429 (Too Many Requests)
+ELEVENLABS_MAX_RETRIES = int(os.environ.get("ELEVENLABS_MAX_RETRIES", "4"))
+_RETRY_BASE_SECONDS = 1.0
+
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+_tts_cache = DiskCache("tts", max_bytes=TTS_CACHE_MAX_BYTES, suffix=".mp3")
+_request_slots = threading.BoundedSemaphore(max(1, ELEVENLABS_CONCURRENCY))
+
+
+def _voiceover_key(text: str) -> str:
+    return cache_key(text, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL, ELEVENLABS_VOICE_SETTINGS)
+
+
+def generate_voiceover_file(text: str, dest_path: str) -> str:
+    """
+    Place MP3 voiceover audio for text at dest_path.
+
+    Serves from the TTS cache when possible. dest_path is in an agent's work
+    dir, so it gets a private copy (a reflink where supported) rather than a
+    hardlink to the cache entry. Raises like generate_voiceover on a miss.
+    """
+    key = _voiceover_key(text)
+    cached_path = _tts_cache.get_path(key)
+    if cached_path is None:
+        cached_path = _tts_cache.put_bytes(key, _synthesize(text))
+    else:
+        print(f"[elevenlabs] TTS cache hit: \"{text[:40]}...\"")
+    link_or_copy(cached_path, dest_path, writable=True)
+    return dest_path
 
 
 def generate_voiceover(text: str) -> bytes:
     """
-    Generate MP3 audio bytes from text using ElevenLabs TTS.
+    Generate MP3 audio bytes from text using ElevenLabs TTS (cached).
 
     Args:
         text: The text to convert to speech.
@@ -27,12 +75,46 @@ def generate_voiceover(text: str) -> bytes:
         ValueError: If API key is not configured.
         requests.HTTPError: If the API request fails.
     """
+    key = _voiceover_key(text)
+    audio = _tts_cache.get_bytes(key)
+    if audio is None:
+        audio = _synthesize(text)
+        _tts_cache.put_bytes(key, audio)
+    return audio
+
+
+def _synthesize(text: str) -> bytes:
+    """
+    Call the ElevenLabs TTS endpoint and return the MP3 bytes. Holds one of
+    the process's request slots per attempt, not while backing off.
+    """
     if not ELEVENLABS_API_KEY:
         raise ValueError("ELEVENLABS_API_KEY environment variable is not set")
 
-    url = f"{ELEVENLABS_BASE_URL}/text-to-speech/{ELEVENLABS_VOICE_ID}"
+    for attempt in range(ELEVENLABS_MAX_RETRIES + 1):
+        with _request_slots:
+            response = _post(text)
+        if response.status_code != 429 or attempt == ELEVENLABS_MAX_RETRIES:
+            break
+        delay = _retry_delay(response, attempt)
+        print(f"[elevenlabs] Rate limited, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    response.raise_for_status()
+    return response.content
 
-    response = requests.post(
+
+def _retry_delay(response, attempt: int) -> float:
+    """Retry-After when the API sends one, else exponential backoff with jitter."""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return _RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(1.0, 1.5)
+
+
+def _post(text: str):
+    url = f"{ELEVENLABS_BASE_URL}/text-to-speech/{ELEVENLABS_VOICE_ID}"
+    return get_session().post(
         url,
         headers={
             "xi-api-key": ELEVENLABS_API_KEY,
@@ -42,12 +124,7 @@ def generate_voiceover(text: str) -> bytes:
         json={
             "text": text,
             "model_id": ELEVENLABS_MODEL,
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.75,
-            },
+            "voice_settings": ELEVENLABS_VOICE_SETTINGS,
         },
         timeout=30,
     )
-    response.raise_for_status()
-    return response.content
@@ -1,16 +1,27 @@
 """
 scraper.py - Scrape a website for the Director Agent pipeline.
 
-Uses Firecrawl (primary) with BrowserUse as fallback.
+Uses Firecrawl (primary) with BrowserUse as fallback. In hedged mode (default),
+BrowserUse is started as soon as Firecrawl is slower than SCRAPE_HEDGE_DELAY_SECONDS
+and the first meaningful result wins.
 Returns a normalized dict: { title, tagline, description, gallery, raw_browse_data, source }
+
+Successful scrapes are cached on disk, keyed on the normalized URL.
 """
 
-import requests
 import sys
 import os
 import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from dotenv import load_dotenv
 
+from src.cache import DiskCache, cache_key
+from src.httpclient import get_session
+
 load_dotenv()
 
 FIRECRAWL_API_KEY = os.environ.get("FIRECRAWL_API_KEY")
@@ -19,12 +30,101 @@ FIRECRAWL_ENDPOINT = "https://api.firecrawl.dev/v1/scrape"
 BROWSER_USE_API_KEY = os.environ.get("BROWSER_USE_API_KEY")
 BROWSER_USE_ENDPOINT = "https://api.browser-use.com/api/v2/skills/d68e4535-36d8-402c-b637-79207245b916/execute"
 
+SCRAPE_CACHE_TTL_SECONDS = int(os.environ.get("SCRAPE_CACHE_TTL_SECONDS", "3600"))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.environ.get("SCRAPE_CACHE_MAX_ENTRIES", "500"))
+
+_scrape_cache = DiskCache(
+    "scrape",
+    ttl_seconds=SCRAPE_CACHE_TTL_SECONDS,
+    max_entries=SCRAPE_CACHE_MAX_ENTRIES,
+    suffix=".json",
+)
+
+# Hedging: start BrowserUse if Firecrawl hasn't answered within the delay.
+# Tune the delay to roughly Firecrawl's p95, as reported by scrape_stats().
+SCRAPE_HEDGE = os.environ.get("SCRAPE_HEDGE", "1") == "1"
+SCRAPE_HEDGE_DELAY_SECONDS = float(os.environ.get("SCRAPE_HEDGE_DELAY_SECONDS", "8"))
+
+# A hedged scrape can hold two threads, and up to STAGE_WORKERS (api.py) run at
+# once. Sized so a scrape never queues here, which would eat into the delay.
+_STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", "32"))
+_hedge_executor = ThreadPoolExecutor(max_workers=2 * _STAGE_WORKERS, thread_name_prefix="scrape")
+_stats_lock = threading.Lock()
+_wins = {"firecrawl": 0, "browser-use": 0}
+_hedged_count = 0
+_firecrawl_latencies = deque(maxlen=200)  # seconds, successful Firecrawl calls only
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for cache keys: lowercase scheme and host, no
+    default port, fragment or trailing slash, sorted query without utm_* params.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port is None or (scheme, port) in (("http", 80), ("https", 443)):
+        netloc = host
+    else:
+        netloc = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def scrape_stats() -> dict:
+    """
+    Scrape counters for this process: cache hits/misses, which backend won,
+    how many scrapes were hedged, and Firecrawl latency percentiles.
+    """
+    with _stats_lock:
+        latencies = sorted(_firecrawl_latencies)
+        stats = {
+            "cache": _scrape_cache.stats(),
+            "wins": dict(_wins),
+            "hedged": _hedged_count,
+            "hedge_delay_seconds": SCRAPE_HEDGE_DELAY_SECONDS,
+        }
+    if latencies:
+        stats["firecrawl_p50_seconds"] = round(latencies[len(latencies) // 2], 2)
+        stats["firecrawl_p95_seconds"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+    return stats
+
+
+def scrape_url(url: str, force_refresh: bool = False) -> dict | None:
+    """
+    Scrape a website, serving repeat URLs from the scrape cache.
+    Pass force_refresh=True to bypass the cache (the fresh result is still stored).
+    Returns normalized dict or None on total failure.
+    """
+    key = cache_key(normalize_url(url))
+    if not force_refresh:
+        cached = _scrape_cache.get_json(key)
+        if cached is not None:
+            print(f"[scraper] Cache hit for {url} ('{cached.get('title')}')")
+            return cached
+
+    result = _scrape_uncached(url)
+    if result:
+        _scrape_cache.put_json(key, result)
+    return result
+
 
-def scrape_url(url: str) -> dict | None:
+def _scrape_uncached(url: str) -> dict | None:
     """
     Scrape a website. Tries Firecrawl first, falls back to BrowserUse.
     Returns normalized dict or None on total failure.
     """
+    if SCRAPE_HEDGE:
+        return _scrape_hedged(url)
+
     # Try Firecrawl first
     if FIRECRAWL_API_KEY:
         result = _scrape_firecrawl(url)
@@ -41,6 +141,71 @@ def scrape_url(url: str) -> dict | None:
     return None
 
 
+def _scrape_hedged(url: str) -> dict | None:
+    """
+    Race Firecrawl and BrowserUse. BrowserUse starts once Firecrawl has taken
+    longer than the hedge delay (or immediately if Firecrawl fails first).
+    The first result that passes the backend's content validation wins.
+    """
+    global _hedged_count
+    pending = {}
+
+    if FIRECRAWL_API_KEY:
+        started = threading.Event()
+        firecrawl = _hedge_executor.submit(_timed_firecrawl, url, started)
+        pending[firecrawl] = "firecrawl"
+
+        # The hedge delay counts from when the request starts, not from submission
+        started.wait()
+        done, _ = wait(pending, timeout=SCRAPE_HEDGE_DELAY_SECONDS)
+        if done:
+            result = firecrawl.result()
+            if result:
+                _record_win("firecrawl")
+                return result
+            del pending[firecrawl]
+            print("[scraper] Firecrawl failed, trying BrowserUse fallback...")
+        else:
+            print(f"[scraper] Firecrawl slower than {SCRAPE_HEDGE_DELAY_SECONDS}s, hedging with BrowserUse...")
+            with _stats_lock:
+                _hedged_count += 1
+
+    pending[_hedge_executor.submit(_scrape_browseruse, url)] = "browser-use"
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            backend = pending.pop(future)
+            result = future.result()
+            if result:
+                # A blocking request can't be interrupted mid-flight; cancel the
+                # loser if it hasn't started, otherwise its result is discarded.
+                for loser in pending:
+                    loser.cancel()
+                _record_win(backend)
+                print(f"[scraper] {backend} won the scrape race")
+                return result
+
+    print("[scraper] All scraping methods failed.")
+    return None
+
+
+def _record_win(backend: str):
+    with _stats_lock:
+        _wins[backend] += 1
+
+
+def _timed_firecrawl(url: str, started: threading.Event) -> dict | None:
+    """_scrape_firecrawl, recording its latency (measured in the worker, so queueing isn't counted)."""
+    started.set()
+    begin = time.monotonic()
+    result = _scrape_firecrawl(url)
+    if result:
+        with _stats_lock:
+            _firecrawl_latencies.append(time.monotonic() - begin)
+    return result
+
+
 def _scrape_firecrawl(url: str) -> dict | None:
     """Scrape using Firecrawl API. Returns normalized dict or None."""
     print(f"[scraper] Scraping {url} via Firecrawl...")
@@ -70,7 +235,7 @@ def _scrape_firecrawl(url: str) -> dict | None:
     }
 
     try:
-        r = requests.post(FIRECRAWL_ENDPOINT, json=payload, headers=headers, timeout=30)
+        r = get_session().post(FIRECRAWL_ENDPOINT, json=payload, headers=headers, timeout=30)
         r.raise_for_status()
         data = r.json()
 
@@ -151,7 +316,7 @@ def _scrape_browseruse(url: str) -> dict | None:
     payload = {"parameters": {"url": url}}
 
     try:
-        r = requests.post(BROWSER_USE_ENDPOINT, json=payload, headers=headers, timeout=60)
+        r = get_session().post(BROWSER_USE_ENDPOINT, json=payload, headers=headers, timeout=60)
         r.raise_for_status()
         data = r.json()
 
@@ -1,35 +1,102 @@
 """
 api.py - FastAPI service for the Director Agent.
 Accepts a Website URL, runs the pipeline, and returns a job ID.
-All work happens in background tasks with granular stage reporting.
+Jobs run on an in-process scheduler with granular stage reporting: a wide pool
+for network stages (scrape, LLM) and a narrow pool for CPU-bound renders.
+Batches submit many jobs at once and share scrapes of duplicate URLs.
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import os
+import copy
 import json
 import uuid
+import math
 import asyncio
+import functools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from src.agents.schemas import ShowcaseProps
 from src.agents.pipeline import orchestrate_pipeline
-from src.agents.scraper import scrape_url
-from src.agents.agents import Agents
-from src.sandbox.render import render_video, RENDER_MODE
+from src.agents.scraper import normalize_url, scrape_url, scrape_stats
+from src.agents.agents import Agents, llm_cache_stats
+from src.sandbox.render import render_video, RENDER_MODE, REMOTION_PROJECT_DIR, PUBLISHED_VIDEO_RE
+from src.sandbox import code_cache, render_server, segments, workdirs
+from src.jobstore import get_job_store, FINISHED_STATUSES
+
+# Scraping and LLM calls use blocking HTTP clients (requests / OpenAI). They run
+# on this bounded executor so the event loop stays free for /status and /health.
+STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", "32"))
+_stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+
+# Renders (Remotion / Cline) are CPU-bound, so only a few run at once.
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "2"))
+# Jobs admitted (running or waiting) before /generate starts answering 429.
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "100"))
+# URLs accepted by one /generate/batch request.
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "50"))
+# Retry-After hint per render "wave" ahead of a rejected request.
+QUEUE_RETRY_AFTER_SECONDS = int(os.environ.get("QUEUE_RETRY_AFTER_SECONDS", "30"))
+# SSE streams re-read the store this often (updates from other workers, queue
+# position changes) and send a keepalive when nothing changed.
+SSE_POLL_SECONDS = float(os.environ.get("SSE_POLL_SECONDS", "5"))
 
-# In-memory job store
-jobs = {}
+os.makedirs("outputs", exist_ok=True)
 
-app = FastAPI(title="Director Agent API")
+# Job store (SQLite-WAL by default, shared across worker processes)
+jobs = get_job_store()
 
-os.makedirs("outputs", exist_ok=True)
-app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
+# SSE subscribers: job_id -> queues that receive the job dict on every update
+_job_subscribers: dict[str, set[asyncio.Queue]] = {}
+# (normalized url, force_refresh) -> scrape in flight, so concurrent jobs for one URL share it
+_scrapes_in_flight: dict[tuple[str, bool], asyncio.Future] = {}
+# Tasks marking batches finished once all their jobs are
+_batch_watchers: set[asyncio.Task] = set()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    interrupted = jobs.recover_interrupted()
+    if interrupted:
+        print(f"[jobs] Failed {interrupted} jobs interrupted by a restart")
+    if RENDER_MODE == "agentic":
+        workdirs.warm(REMOTION_PROJECT_DIR)
+    yield
+    await render_server.shutdown()
+    jobs.close()
+
+
+app = FastAPI(title="Director Agent API", lifespan=lifespan)
+
+
+class OutputFiles(StaticFiles):
+    """
+    outputs/ with long-lived caching for published videos. Their names carry
+    a content hash (see render._publish_output), so they never change and can
+    be cached forever by browsers and CDNs. Range requests and zero-copy
+    sends (where the server supports pathsend) come from FileResponse.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if PUBLISHED_VIDEO_RE.search(str(full_path)):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+app.mount("/outputs", OutputFiles(directory="outputs"), name="outputs")
 
 
 class GenerateRequest(BaseModel):
     url: str
+    force_refresh: bool = False  # bypass the scrape cache
 
 
 class GenerateResponse(BaseModel):
@@ -45,34 +112,244 @@ class StatusResponse(BaseModel):
     stage_detail: Optional[str] = None
     video_path: Optional[str] = None
     message: Optional[str] = None
+    queue_depth: Optional[int] = None
+    queue_position: Optional[int] = None
+
+
+class BatchGenerateRequest(BaseModel):
+    urls: list[str] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    force_refresh: bool = False  # bypass the scrape cache for every URL
+
+
+class BatchGenerateResponse(BaseModel):
+    batch_id: str
+    status: str
+    job_ids: list[str]  # one per URL, in request order
+    message: str
+
+
+class BatchItemStatus(BaseModel):
+    job_id: str
+    url: str
+    status: str
+    stage: Optional[str] = None
+    stage_detail: Optional[str] = None
+    video_path: Optional[str] = None
+    message: Optional[str] = None
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    processing: int
+    progress: float  # finished jobs / total
+    stages: dict[str, int]  # jobs per current stage
+    queue_depth: int
+    items: list[BatchItemStatus]
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot admit another job."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full, retry later")
+        self.retry_after = retry_after
+
+
+class StagePool:
+    """A bounded set of slots for one stage type, with FIFO waiter tracking."""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.active = 0
+        self.waiting: list[str] = []
+        self._semaphore = asyncio.Semaphore(size)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, job_id: str):
+        self.waiting.append(job_id)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting.remove(job_id)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def position(self, job_id: str) -> int | None:
+        """1-based position of a job waiting for this pool, or None if not waiting."""
+        try:
+            return self.waiting.index(job_id) + 1
+        except ValueError:
+            return None
+
+
+class JobScheduler:
+    """
+    Runs job coroutines with admission control. Each stage type has its own
+    pool: a wide one for network-bound scrape/LLM calls and a narrow one for
+    CPU-bound renders.
+    """
+
+    def __init__(self):
+        self.pools = {
+            "network": StagePool("network", STAGE_WORKERS),
+            "render": StagePool("render", RENDER_WORKERS),
+        }
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def pending(self) -> int:
+        """Jobs admitted and not yet finished."""
+        return len(self._tasks)
+
+    def slot(self, stage: str, job_id: str):
+        return self.pools[stage].slot(job_id)
+
+    def submit(self, job_id: str, job_fn, *args) -> asyncio.Task:
+        """Admit a job and start its coroutine, or raise QueueFullError."""
+        return self.submit_many([job_id], job_fn, *([arg] for arg in args))[0]
+
+    def submit_many(self, job_ids: list[str], job_fn, *args_per_job) -> list[asyncio.Task]:
+        """
+        Admit all jobs or none (QueueFullError). args_per_job holds one list
+        per argument, with an entry per job.
+        """
+        if self.pending + len(job_ids) > MAX_QUEUED_JOBS:
+            raise QueueFullError(self.retry_after(len(job_ids)))
+        loop = asyncio.get_running_loop()
+        tasks = []
+        for job_id, *args in zip(job_ids, *args_per_job):
+            task = loop.create_task(job_fn(job_id, *args))
+            self._tasks[job_id] = task
+            task.add_done_callback(lambda _, job_id=job_id: self._tasks.pop(job_id, None))
+            tasks.append(task)
+        return tasks
+
+    def queue_depth(self) -> int:
+        """Total jobs waiting for a slot in any pool."""
+        return sum(len(p.waiting) for p in self.pools.values())
+
+    def queue_position(self, job_id: str) -> int | None:
+        for pool in self.pools.values():
+            position = pool.position(job_id)
+            if position is not None:
+                return position
+        return None
+
+    def retry_after(self, jobs: int = 1) -> int:
+        """Rough seconds until render slots free up for this many new jobs."""
+        waves = math.ceil((len(self.pools["render"].waiting) + jobs) / max(RENDER_WORKERS, 1))
+        return QUEUE_RETRY_AFTER_SECONDS * waves
+
+
+scheduler = JobScheduler()
 
 
 def _update_job(job_id: str, **kwargs):
-    """Update job fields."""
-    if job_id in jobs:
-        jobs[job_id].update(kwargs)
+    """Update job fields (coalesced by the job store) and notify SSE subscribers."""
+    try:
+        jobs.update(job_id, **kwargs)
+        subscribers = _job_subscribers.get(job_id)
+        if subscribers:
+            job = jobs.get(job_id)
+            for queue in subscribers:
+                queue.put_nowait(job)
+    except Exception as e:
+        # The update stays queued in the store and is retried on the next
+        # flush; a busy database must not fail the job it describes
+        print(f"[Job {job_id}] Warning: could not persist update: {e}")
+
+
+def _get_job(job_id: str) -> dict | None:
+    """A job from the store, or None. Batch records share the store but aren't jobs."""
+    job = jobs.get(job_id)
+    if job is None or "job_ids" in job:
+        return None
+    return job
+
+
+def _status_response(job_id: str, job: dict) -> StatusResponse:
+    return StatusResponse(
+        job_id=job_id,
+        status=job["status"],
+        stage=job.get("stage"),
+        stage_detail=job.get("stage_detail"),
+        video_path=job.get("video_path"),
+        message=job.get("message"),
+        queue_depth=scheduler.queue_depth(),
+        queue_position=scheduler.queue_position(job_id),
+    )
+
+
+async def _run_blocking(job_id: str, fn, *args, **kwargs):
+    """Run a blocking network-bound stage in the network pool and await it."""
+    loop = asyncio.get_running_loop()
+    async with scheduler.slot("network", job_id):
+        return await loop.run_in_executor(_stage_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def _scrape(job_id: str, url: str, force_refresh: bool) -> dict | None:
+    """
+    Scrape url on the network pool. Jobs asking for a URL that is already
+    being scraped (e.g. duplicates within a batch) wait for that scrape
+    instead of starting another.
+    """
+    key = (normalize_url(url), force_refresh)
+    scrape = _scrapes_in_flight.get(key)
+    if scrape is None:
+        scrape = asyncio.ensure_future(_run_blocking(job_id, scrape_url, url, force_refresh=force_refresh))
+        _scrapes_in_flight[key] = scrape
+        scrape.add_done_callback(lambda _: _scrapes_in_flight.pop(key, None))
+    # Shielded so one job failing or being cancelled doesn't cancel the others' scrape
+    scraped_data = await asyncio.shield(scrape)
+    # Each job gets its own copy to annotate
+    return copy.deepcopy(scraped_data)
+
+
+async def _render_with_slot(job_id: str, props_path: str, detail: str, **render_kwargs) -> str:
+    """Wait for a slot in the render pool, then render, reporting the renderer's milestones."""
+    _update_job(job_id, stage="rendering", stage_detail="Waiting for a render slot...")
+    async with scheduler.slot("render", job_id):
+        _update_job(job_id, stage_detail=detail)
+        return await render_video(
+            props_path,
+            on_progress=lambda stage, stage_detail: _update_job(job_id, stage=stage, stage_detail=stage_detail),
+            **render_kwargs,
+        )
 
 
-async def process_video_templated(job_id: str, url: str):
+async def process_video_templated(job_id: str, url: str, force_refresh: bool = False):
     """Background: templated mode — scrape, analyze, direct, render template."""
     try:
         # Stage 1: Scraping
         _update_job(job_id, stage="scraping", stage_detail="Scraping website content...")
-        scraped_data = scrape_url(url)
+        scraped_data = await _scrape(job_id, url, force_refresh)
         if not scraped_data:
             raise ValueError("Scraping failed: Could not retrieve data from website.")
         _update_job(job_id, stage_detail=f"Scraped '{scraped_data.get('title', 'site')}'")
 
         # Stage 2: Analyzing
         _update_job(job_id, stage="analyzing", stage_detail="AI analyzing website content...")
-        analysis = Agents.analyze(scraped_data)
+        analysis = await _run_blocking(job_id, Agents.analyze, scraped_data)
         _update_job(job_id, stage_detail=f"Hook: {analysis.hook[:60]}...")
 
         # Stage 3: Generating
         _update_job(job_id, stage="generating", stage_detail="Generating video props...")
         project_title = scraped_data.get("title", "Project")
         gallery_images = scraped_data.get("gallery", [])
-        direction = Agents.direct(project_title, analysis, gallery_images)
+        direction = await _run_blocking(job_id, Agents.direct, project_title, analysis, gallery_images)
         showcase_props = ShowcaseProps(config=direction)
 
         props_path = os.path.abspath(f"outputs/temp_props_{job_id}.json")
@@ -81,8 +358,9 @@ async def process_video_templated(job_id: str, url: str):
         _update_job(job_id, stage_detail=f"Props ready for '{direction.product.name}'")
 
         # Stage 4: Rendering
-        _update_job(job_id, stage="rendering", stage_detail="Rendering video from template...")
-        video_path = await render_video(props_path)
+        video_path = await _render_with_slot(
+            job_id, props_path, detail="Rendering video from template...",
+        )
 
         _update_job(
             job_id,
@@ -99,12 +377,12 @@ async def process_video_templated(job_id: str, url: str):
         print(f"[Job {job_id}] Failed: {e}")
 
 
-async def process_video_agentic(job_id: str, url: str):
+async def process_video_agentic(job_id: str, url: str, force_refresh: bool = False):
     """Background: agentic mode — scrape, analyze, storyboard, Cline builds from scratch."""
     try:
         # Stage 1: Scraping
         _update_job(job_id, stage="scraping", stage_detail="Scraping website content...")
-        scraped_data = scrape_url(url)
+        scraped_data = await _scrape(job_id, url, force_refresh)
         if not scraped_data:
             raise ValueError("Scraping failed: Could not retrieve data from website.")
         title = scraped_data.get("title", "site")
@@ -112,13 +390,15 @@ async def process_video_agentic(job_id: str, url: str):
 
         # Stage 2: Analyst Agent
         _update_job(job_id, stage="analyzing", stage_detail="Analyst AI extracting key insights...")
-        analysis = Agents.analyze(scraped_data)
+        analysis = await _run_blocking(job_id, Agents.analyze, scraped_data)
         _update_job(job_id, stage_detail=f"Hook: {analysis.hook[:60]}...")
 
         # Stage 3: Creative Director Agent → Storyboard
         _update_job(job_id, stage="storyboarding", stage_detail="Creative Director designing storyboard...")
         raw = scraped_data.get("raw_browse_data", {})
-        storyboard = Agents.storyboard(
+        storyboard = await _run_blocking(
+            job_id,
+            Agents.storyboard,
             product_name=scraped_data.get("title", "Product"),
             analysis=analysis,
             available_images=scraped_data.get("gallery", []),
@@ -134,10 +414,11 @@ async def process_video_agentic(job_id: str, url: str):
         _update_job(job_id, stage="generating_audio", stage_detail="Generating voiceover with ElevenLabs...")
 
         # Stage 5: Cline builds and renders
-        _update_job(job_id, stage="rendering", stage_detail="Cline is building the video from scratch...")
         dummy_props_path = os.path.abspath(f"outputs/temp_props_{job_id}.json")
-        video_path = await render_video(
+        video_path = await _render_with_slot(
+            job_id,
             dummy_props_path,
+            detail="Cline is building the video from scratch...",
             url=url,
             scraped_data=scraped_data,
             storyboard=storyboard,
@@ -159,57 +440,209 @@ async def process_video_agentic(job_id: str, url: str):
 
 
 @app.post("/generate", response_model=GenerateResponse)
-async def generate(request: GenerateRequest, background_tasks: BackgroundTasks):
+async def generate(request: GenerateRequest):
     """
     Kicks off video generation immediately and returns a job ID.
-    All work (scraping, analysis, storyboard, render) happens in the background.
-    Poll /status/{job_id} for granular progress.
+    All work (scraping, analysis, storyboard, render) runs on the scheduler.
+    Poll /status/{job_id} for granular progress. Returns 429 with a
+    Retry-After header when the job queue is full.
     """
     job_id = str(uuid.uuid4())[:8]
+    job_fn = process_video_agentic if RENDER_MODE == "agentic" else process_video_templated
 
-    jobs[job_id] = {
+    jobs.create(job_id, {
         "status": "processing",
         "stage": "queued",
         "stage_detail": "Starting...",
         "video_path": None,
         "message": None,
-    }
+    })
 
-    if RENDER_MODE == "agentic":
-        background_tasks.add_task(process_video_agentic, job_id, request.url)
-        return GenerateResponse(
-            job_id=job_id,
-            status="processing",
-            message="Multi-agent pipeline started.",
+    try:
+        scheduler.submit(job_id, job_fn, request.url, request.force_refresh)
+    except QueueFullError as e:
+        jobs.delete(job_id)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
         )
+
+    if RENDER_MODE == "agentic":
+        message = "Multi-agent pipeline started."
     else:
-        background_tasks.add_task(process_video_templated, job_id, request.url)
-        return GenerateResponse(
-            job_id=job_id,
-            status="processing",
-            message="Templated pipeline started.",
+        message = "Templated pipeline started."
+    return GenerateResponse(job_id=job_id, status="processing", message=message)
+
+
+@app.post("/generate/batch", response_model=BatchGenerateResponse)
+async def generate_batch(request: BatchGenerateRequest):
+    """
+    Starts one job per URL and returns a batch ID with the job IDs. Jobs run
+    on the same scheduler as /generate: scrapes and LLM calls fan out across
+    the network pool while renders queue for the render pool, and duplicate
+    URLs are scraped once. The batch is admitted whole or not at all (429).
+    Poll /batches/{batch_id} for aggregate progress.
+    """
+    batch_id = str(uuid.uuid4())[:8]
+    job_ids = [str(uuid.uuid4())[:8] for _ in request.urls]
+    job_fn = process_video_agentic if RENDER_MODE == "agentic" else process_video_templated
+
+    for job_id, url in zip(job_ids, request.urls):
+        jobs.create(job_id, {
+            "status": "processing",
+            "stage": "queued",
+            "stage_detail": "Starting...",
+            "video_path": None,
+            "message": None,
+            "batch_id": batch_id,
+            "url": url,
+        })
+
+    try:
+        tasks = scheduler.submit_many(
+            job_ids, job_fn, request.urls, [request.force_refresh] * len(job_ids),
+        )
+    except QueueFullError as e:
+        for job_id in job_ids:
+            jobs.delete(job_id)
+        raise HTTPException(
+            status_code=429,
+            detail=f"{e} ({len(job_ids)} jobs requested)",
+            headers={"Retry-After": str(e.retry_after)},
         )
 
+    jobs.create(batch_id, {"status": "processing", "job_ids": job_ids})
+    watcher = asyncio.create_task(_finish_batch(batch_id, tasks))
+    _batch_watchers.add(watcher)
+    watcher.add_done_callback(_batch_watchers.discard)
+
+    return BatchGenerateResponse(
+        batch_id=batch_id,
+        status="processing",
+        job_ids=job_ids,
+        message=f"{len(job_ids)} jobs started.",
+    )
+
+
+async def _finish_batch(batch_id: str, tasks: list[asyncio.Task]):
+    """Mark the batch finished (and so evictable) once all its jobs are."""
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _update_job(batch_id, status="completed")
+
+
+@app.get("/batches/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str):
+    batch = jobs.get(batch_id)
+    if batch is None or "job_ids" not in batch:
+        raise HTTPException(status_code=404, detail="Batch ID not found")
+
+    items = []
+    counts = {"completed": 0, "failed": 0, "processing": 0}
+    stages: dict[str, int] = {}
+    for job_id in batch["job_ids"]:
+        # Evicted jobs are gone from the store; report them as failed
+        job = jobs.get(job_id) or {"status": "failed", "message": "Job expired"}
+        status = job["status"] if job["status"] in counts else "processing"
+        counts[status] += 1
+        if job.get("stage"):
+            stages[job["stage"]] = stages.get(job["stage"], 0) + 1
+        items.append(BatchItemStatus(
+            job_id=job_id,
+            url=job.get("url", ""),
+            status=job["status"],
+            stage=job.get("stage"),
+            stage_detail=job.get("stage_detail"),
+            video_path=job.get("video_path"),
+            message=job.get("message"),
+        ))
+
+    total = len(items)
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        status="processing" if counts["processing"] else "completed",
+        total=total,
+        completed=counts["completed"],
+        failed=counts["failed"],
+        processing=counts["processing"],
+        progress=round((counts["completed"] + counts["failed"]) / total, 3) if total else 1.0,
+        stages=stages,
+        queue_depth=scheduler.queue_depth(),
+        items=items,
+    )
+
 
 @app.get("/status/{job_id}", response_model=StatusResponse)
 async def get_status(job_id: str):
-    if job_id not in jobs:
+    job = _get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job ID not found")
 
-    job = jobs[job_id]
-    return StatusResponse(
-        job_id=job_id,
-        status=job["status"],
-        stage=job.get("stage"),
-        stage_detail=job.get("stage_detail"),
-        video_path=job.get("video_path"),
-        message=job.get("message"),
+    return _status_response(job_id, job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of job progress. Emits a `status` event (same
+    shape as /status) on every stage transition and closes once the job is
+    completed or failed.
+    """
+    job = _get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job ID not found")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    _job_subscribers.setdefault(job_id, set()).add(queue)
+
+    async def stream():
+        current = job
+        last_payload = None
+        try:
+            while True:
+                payload = _status_response(job_id, current).model_dump_json()
+                if payload != last_payload:
+                    yield f"event: status\ndata: {payload}\n\n"
+                    last_payload = payload
+                if current.get("status") in FINISHED_STATUSES:
+                    break
+
+                try:
+                    current = await asyncio.wait_for(queue.get(), SSE_POLL_SECONDS)
+                    # Only the latest snapshot matters if several queued up
+                    while not queue.empty():
+                        current = queue.get_nowait()
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    current = jobs.get(job_id) or current
+                    yield ": keepalive\n\n"
+        finally:
+            subscribers = _job_subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del _job_subscribers[job_id]
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "render_mode": RENDER_MODE}
+    return {
+        "status": "ok",
+        "render_mode": RENDER_MODE,
+        "jobs_pending": scheduler.pending,
+        "queue_depth": scheduler.queue_depth(),
+        "scrape": scrape_stats(),
+        "llm_cache": llm_cache_stats(),
+        "segment_cache": segments.stats(),
+        "code_cache": code_cache.stats(),
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+"""
+cache.py - Small disk-backed caches shared by the pipeline stages.
+
+Each cache is a directory under CACHE_ROOT holding one file per entry, sharded
+by key prefix. An entry's age (for TTL) is its file mtime; its last use (for
+LRU eviction) is its atime, which the cache sets explicitly on every hit so
+eviction works on noatime mounts too.
+
+Writes don't scan the cache. Each instance keeps running byte and entry
+totals and only rescans (evicting as it goes) when they pass a limit, or
+every EVICT_RESCAN_SECONDS to pick up expiries and other processes' writes.
+
+Entries are read-only (0444). They are hardlinked into projects, and a tool
+that rewrites a linked file in place would otherwise corrupt the entry for
+every later job. Directories that an agent edits get private copies
+instead (link_or_copy(..., writable=True)).
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_ROOT = os.path.expanduser(os.environ.get("CACHE_ROOT", "~/.cache/clinereel"))
+
+
+def cache_key(*parts) -> str:
+    """Stable sha256 hex key over JSON-encodable parts."""
+    blob = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# Longest interval between full scans of a cache directory
+EVICT_RESCAN_SECONDS = float(os.environ.get("CACHE_EVICT_RESCAN_SECONDS", "300"))
+
+# Fraction of the limits a cache is evicted down to once it passes them
+_EVICT_LOW_WATER = 0.9
+
+_ENTRY_MODE = 0o444
+_FICLONE = 0x40049409
+_reflink_supported = fcntl is not None
+
+
+def link_or_copy(src: str, dest: str, writable: bool = False):
+    """
+    Place src at dest via hardlink, falling back to a copy across filesystems.
+    With writable=True dest is a private, writable file instead (see
+    reflink_or_copy), for directories where it may be rewritten in place.
+    """
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    if os.path.lexists(dest):
+        os.remove(dest)
+    if writable:
+        reflink_or_copy(src, dest)
+        return
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def reflink_or_copy(src: str, dest: str):
+    """
+    Copy src's data to a new file at dest: a reflink (FICLONE), which costs no
+    data I/O, where the filesystem supports it, else a plain copy.
+    """
+    global _reflink_supported
+    if _reflink_supported:
+        try:
+            with open(src, "rb") as s, open(dest, "wb") as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            return
+        except OSError:
+            # Filesystem without reflinks (ext4, tmpfs, ...): copy from now on
+            _reflink_supported = False
+    shutil.copyfile(src, dest)
+
+
+class DiskCache:
+    """
+    File-per-entry cache with optional TTL, entry-count and byte-size limits.
+
+    Safe to share between threads and processes: writes go to a temp file and
+    are renamed into place, and a vanished entry is just a miss.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        suffix: str = "",
+    ):
+        self.name = name
+        self.root = os.path.join(CACHE_ROOT, name)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running totals since the last scan; None until the first one
+        self._bytes = None
+        self._count = None
+        self._scanned_at = 0.0
+        self._scan_lock = threading.Lock()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + self.suffix)
+
+    def get_path(self, key: str) -> str | None:
+        """Path of a live entry (marking it recently used), or None on a miss."""
+        path = self.path_for(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._record(hit=False)
+            return None
+
+        now = time.time()
+        if self.ttl_seconds is not None and now - st.st_mtime > self.ttl_seconds:
+            self._remove(path)
+            self._record(hit=False)
+            return None
+
+        try:
+            os.utime(path, (now, st.st_mtime))
+        except OSError:
+            pass
+        self._record(hit=True)
+        return path
+
+    def get_bytes(self, key: str) -> bytes | None:
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_json(self, key: str):
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            self._remove(self.path_for(key))
+            return None
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        replaced = _size(path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, _ENTRY_MODE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._added(len(data), replaced)
+        return path
+
+    def put_json(self, key: str, value) -> str:
+        return self.put_bytes(key, json.dumps(value, default=str).encode("utf-8"))
+
+    def temp_file(self) -> tuple[int, str]:
+        """
+        (fd, path) of a new temp file inside the cache, on the same filesystem
+        as its entries so put_file(..., move=True) is an atomic rename.
+        """
+        tmp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return tempfile.mkstemp(dir=tmp_dir, prefix=".tmp-")
+
+    def put_file(self, key: str, src_path: str, move: bool = False) -> str:
+        """Store an existing file as an entry. With move=True, src_path is renamed in."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replaced = _size(path)
+        if move:
+            os.chmod(src_path, _ENTRY_MODE)
+            try:
+                os.replace(src_path, path)
+            except OSError:
+                shutil.move(src_path, path)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            os.close(fd)
+            shutil.copyfile(src_path, tmp_path)
+            os.chmod(tmp_path, _ENTRY_MODE)
+            os.replace(tmp_path, path)
+        self._added(_size(path) or 0, replaced)
+        return path
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _added(self, size: int, replaced: int | None):
+        """Account for a write (replacing an entry of size replaced, if any); scan when due."""
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size - (replaced or 0)
+                self._count += 0 if replaced is not None else 1
+            due = (
+                self._bytes is None
+                or time.monotonic() - self._scanned_at > EVICT_RESCAN_SECONDS
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+                or (self.max_entries is not None and self._count > self.max_entries)
+            )
+        # One scan at a time; concurrent writers rely on its result
+        if due and self._scan_lock.acquire(blocking=False):
+            try:
+                self.evict()
+            finally:
+                self._scan_lock.release()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least-recently-used ones over the limits.
+        Scans the whole cache and resets the running totals.
+        """
+        entries = []
+        now = time.time()
+        removed = 0
+        for shard in _listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            for name in _listdir(shard_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if self.ttl_seconds is not None and now - st.st_mtime > self.ttl_seconds:
+                    self._remove(path)
+                    removed += 1
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        count = len(entries)
+        # Once over a limit, evict down to a low-water mark so the next
+        # writes don't each trigger another scan
+        over = (self.max_entries is not None and count > self.max_entries) or (
+            self.max_bytes is not None and total_bytes > self.max_bytes
+        )
+        scale = _EVICT_LOW_WATER if over else 1.0
+        for _, size, path in entries:
+            over_count = self.max_entries is not None and count > self.max_entries * scale
+            over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes * scale
+            if not (over_count or over_bytes):
+                break
+            self._remove(path)
+            count -= 1
+            total_bytes -= size
+            removed += 1
+
+        with self._lock:
+            self._bytes = total_bytes
+            self._count = count
+            self._scanned_at = time.monotonic()
+        return removed
+
+    def _record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _size(path: str) -> int | None:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+
+def _listdir(path: str) -> list[str]:
+    try:
+        return os.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
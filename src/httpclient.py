@@ -0,0 +1,43 @@
+"""
+httpclient.py - Shared pooled HTTP session for outbound calls.
+
+Scraping, asset downloads and ElevenLabs TTS all go through one
+requests.Session, so keep-alive connections (and their TLS sessions) to the
+same host are reused across calls and across jobs instead of paying a fresh
+TCP + TLS handshake per request.
+"""
+
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Distinct hosts whose connection pools are kept alive at once
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", "32"))
+# Open connections per host; further requests to that host wait for one
+HTTP_POOL_PER_HOST = int(os.environ.get("HTTP_POOL_PER_HOST", "16"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide session with keep-alive pools and a per-host connection cap."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_HOSTS,
+                    pool_maxsize=HTTP_POOL_PER_HOST,
+                    pool_block=True,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # The session is shared by every job, so don't carry cookies between them
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                _session = session
+    return _session
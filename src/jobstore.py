@@ -0,0 +1,370 @@
+"""
+jobstore.py - Pluggable job storage for the API.
+
+Backends (selected by the JOB_STORE env var):
+  - "sqlite" (default): SQLite database in WAL mode. Every API worker process
+                        pointed at the same JOB_STORE_PATH shares the jobs.
+  - "memory":           Process-local dict. Lost on restart; handy for development.
+
+Updates are coalesced in memory and flushed in one transaction every
+JOB_STORE_FLUSH_INTERVAL seconds, so a burst of stage_detail changes costs a
+single commit. Creates, deletes and terminal transitions (completed / failed)
+wake the flusher straight away.
+Jobs that finished more than JOB_TTL_SECONDS ago are evicted in the background.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+JOB_STORE = os.environ.get("JOB_STORE", "sqlite")
+# Kept outside outputs/, which is served publicly
+JOB_STORE_PATH = os.path.expanduser(
+    os.environ.get("JOB_STORE_PATH", "~/.cache/clinereel/jobs.db")
+)
+JOB_STORE_FLUSH_INTERVAL = float(os.environ.get("JOB_STORE_FLUSH_INTERVAL", "0.5"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", str(24 * 3600)))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+# How often the background flusher also runs TTL eviction
+_EVICT_EVERY_SECONDS = 300
+
+
+class JobStore(ABC):
+    """Interface implemented by every job store backend."""
+
+    @abstractmethod
+    def create(self, job_id: str, job: dict):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Drop jobs that finished more than the TTL ago. Returns the number removed."""
+
+    def recover_interrupted(self) -> int:
+        """
+        Fail unfinished jobs left behind by a worker process that is gone,
+        e.g. after a restart. Returns the number of jobs failed.
+        """
+        return 0
+
+    def flush(self):
+        """Persist any coalesced updates."""
+
+    def close(self):
+        self.flush()
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store backed by a dict."""
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, job: dict):
+        # No background thread here; evicting on insert keeps the dict bounded
+        self.evict_expired()
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {**job, "created_at": now, "updated_at": now}
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.get("status") in FINISHED_STATUSES and job["updated_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite-backed store in WAL mode, safe to share across worker processes.
+
+    Jobs are stored as a JSON blob plus indexed status / created_at /
+    updated_at columns. updated_at is the last flushed change, which for a
+    finished job is when it finished (terminal updates flush right away).
+
+    Creates, updates and deletes are queued in memory and written by the
+    flusher thread, so callers on the event loop never wait on SQLite's
+    write lock; reads use their own connection, which WAL never blocks.
+    Reads from this process see queued changes that are not flushed yet;
+    other processes see them after the next flush.
+    """
+
+    def __init__(
+        self,
+        path: str = JOB_STORE_PATH,
+        flush_interval: float = JOB_STORE_FLUSH_INTERVAL,
+        ttl_seconds: int = JOB_TTL_SECONDS,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.ttl_seconds = ttl_seconds
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints, not on every commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            DROP INDEX IF EXISTS idx_jobs_status_created;
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+            """
+        )
+        self._read_conn = self._connect()
+
+        # _lock only guards the queues below and is never held across SQLite
+        # calls; _write_lock and _read_lock serialize each connection
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._created: dict[str, tuple[float, dict]] = {}
+        self._pending: dict[str, dict] = {}
+        self._deleted: set[str] = set()
+        # Changes taken by a flush that hasn't committed yet
+        self._flushing: tuple[dict, dict, set] | None = None
+
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="jobstore-flush", daemon=True)
+        self._flusher.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def create(self, job_id: str, job: dict):
+        with self._lock:
+            self._deleted.discard(job_id)
+            self._pending.pop(job_id, None)
+            # The owning worker, so a restart can tell which jobs died with it
+            self._created[job_id] = (time.time(), {**job, "owner": os.getpid()})
+        # Flush now so other workers can see the job straight away
+        self._wake.set()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            queued = [(self._created, self._pending, self._deleted)]
+            if self._flushing is not None:
+                queued.insert(0, self._flushing)
+        # Oldest first; a queued create or delete overrides the database
+        job, queued_row = None, False
+        for created, _, deleted in queued:
+            if job_id in deleted:
+                job, queued_row = None, True
+            elif job_id in created:
+                job, queued_row = dict(created[job_id][1]), True
+        if not queued_row:
+            with self._read_lock:
+                row = self._read_conn.execute(
+                    "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+            if row is not None:
+                job = json.loads(row[0])
+        if job is None:
+            return None
+        for _, pending, _ in queued:
+            job.update(pending.get(job_id, {}))
+        return job
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._pending.setdefault(job_id, {}).update(fields)
+        if fields.get("status") in FINISHED_STATUSES:
+            self._wake.set()
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._created.pop(job_id, None)
+            self._pending.pop(job_id, None)
+            self._deleted.add(job_id)
+        self._wake.set()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                if not (self._created or self._pending or self._deleted):
+                    return
+                self._flushing = (self._created, self._pending, self._deleted)
+                self._created, self._pending, self._deleted = {}, {}, set()
+            created, pending, deleted = self._flushing
+            now = time.time()
+            try:
+                # Inside the try: a "database is locked" here must requeue too
+                self._conn.execute("BEGIN IMMEDIATE")
+                for job_id, (created_at, job) in created.items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO jobs (job_id, status, created_at, updated_at, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (job_id, job.get("status", "processing"), created_at, created_at, json.dumps(job)),
+                    )
+                for job_id, fields in pending.items():
+                    row = self._conn.execute(
+                        "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    job = json.loads(row[0])
+                    job.update(fields)
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE job_id = ?",
+                        (job.get("status", "processing"), now, json.dumps(job), job_id),
+                    )
+                self._conn.executemany(
+                    "DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in deleted]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                # Put the changes back under anything queued since, so the
+                # next flush retries them
+                with self._lock:
+                    self._created = {**created, **self._created}
+                    for job_id, fields in pending.items():
+                        self._pending[job_id] = {**fields, **self._pending.get(job_id, {})}
+                    self._deleted |= deleted
+                    self._flushing = None
+                raise
+            with self._lock:
+                self._flushing = None
+
+    def recover_interrupted(self) -> int:
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        now = time.time()
+        failed = 0
+        with self._write_lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                rows = self._conn.execute(
+                    f"SELECT job_id, data FROM jobs WHERE status NOT IN ({placeholders})",
+                    FINISHED_STATUSES,
+                ).fetchall()
+                for job_id, data in rows:
+                    job = json.loads(data)
+                    owner = job.get("owner")
+                    # Our own pid here means a dead process's pid was reused
+                    if isinstance(owner, int) and owner != os.getpid() and _process_alive(owner):
+                        continue
+                    if "job_ids" in job:
+                        # A batch is finished once its jobs are; they fail below
+                        job["status"] = "completed"
+                    else:
+                        job.update(
+                            status="failed",
+                            message="Interrupted by a server restart",
+                            stage_detail="Error: interrupted by a server restart",
+                        )
+                        failed += 1
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE job_id = ?",
+                        (job["status"], now, json.dumps(job), job_id),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return failed
+
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._write_lock:
+            cur = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, cutoff),
+            )
+            return cur.rowcount
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        self._flusher.join(timeout=self.flush_interval * 2)
+        self.flush()
+        with self._write_lock, self._read_lock:
+            self._conn.close()
+            self._read_conn.close()
+
+    def _flush_loop(self):
+        last_evict = 0.0
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - last_evict > _EVICT_EVERY_SECONDS:
+                    removed = self.evict_expired()
+                    last_evict = time.time()
+                    if removed:
+                        print(f"[jobstore] Evicted {removed} finished jobs")
+            except Exception as e:
+                print(f"[jobstore] Warning: flush failed: {e}")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_job_store() -> JobStore:
+    """Build the job store selected by JOB_STORE."""
+    if JOB_STORE == "memory":
+        return MemoryJobStore()
+    if JOB_STORE == "sqlite":
+        return SQLiteJobStore()
+    raise ValueError(f"Unknown JOB_STORE backend: {JOB_STORE!r}")
@@ -0,0 +1,136 @@
+"""
+asset_store.py - Global content-addressed store for downloaded assets.
+
+Each asset's bytes are stored once, keyed by their sha256. A URL index maps
+source URLs to the blob they produced, so a URL seen by any job or worker is
+never downloaded again while its blob is cached. Filenames are derived from
+the content hash, making them identical across processes, and projects get
+assets by hardlink instead of by writing the bytes again.
+
+Images can be normalized on the way in (see images.py); the derived variant
+is cached by source hash so the same bytes are only processed once.
+"""
+
+import os
+import hashlib
+
+from src.cache import DiskCache, cache_key, link_or_copy
+from . import images
+
+ASSET_STORE_MAX_BYTES = int(os.environ.get("ASSET_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# How long a URL -> content mapping is trusted before the URL is fetched again
+ASSET_URL_TTL_SECONDS = int(os.environ.get("ASSET_URL_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_blobs = DiskCache("assets/blobs", max_bytes=ASSET_STORE_MAX_BYTES)
+_url_index = DiskCache("assets/urls", ttl_seconds=ASSET_URL_TTL_SECONDS, suffix=".json")
+# source digest + normalization params -> digest of the derived variant
+_variant_index = DiskCache("assets/variants", suffix=".json")
+
+
+def asset_filename(digest: str, ext: str) -> str:
+    """Deterministic public/ filename for a blob."""
+    return f"asset_{digest[:16]}{ext}"
+
+
+def lookup(url: str) -> tuple[str, str] | None:
+    """(blob_path, filename) for a URL fetched before, or None."""
+    entry = _url_index.get_json(cache_key(url))
+    if not entry:
+        return None
+    path = _blobs.get_path(entry["digest"])
+    if path is None:
+        return None
+    return path, asset_filename(entry["digest"], entry["ext"])
+
+
+def put(content: bytes, ext: str, url: str | None = None) -> tuple[str, str]:
+    """
+    Store bytes (deduplicated by content) and optionally index them under url.
+    Returns (blob_path, filename).
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    path = _blobs.get_path(digest)
+    if path is None:
+        path = _blobs.put_bytes(digest, content)
+    if url:
+        _url_index.put_json(cache_key(url), {"digest": digest, "ext": ext})
+    return path, asset_filename(digest, ext)
+
+
+def temp_file() -> tuple[int, str]:
+    """(fd, path) to stream a download into before handing it to put_file()."""
+    return _blobs.temp_file()
+
+
+def put_file(
+    src_path: str,
+    digest: str,
+    ext: str,
+    url: str | None = None,
+    normalize: bool = False,
+) -> tuple[str, str]:
+    """
+    Move a file whose sha256 is already known into the store, without
+    reading it into memory, and optionally index it under url.
+    With normalize=True, images are downscaled/re-encoded first.
+    Returns (blob_path, filename).
+    """
+    if normalize and images.normalize_available():
+        digest, ext = _normalized(src_path, digest, ext)
+
+    path = _blobs.get_path(digest)
+    if path is None:
+        path = _blobs.put_file(digest, src_path, move=True)
+    else:
+        _remove(src_path)
+    if url:
+        _url_index.put_json(cache_key(url), {"digest": digest, "ext": ext})
+    return path, asset_filename(digest, ext)
+
+
+def _normalized(src_path: str, source_digest: str, ext: str) -> tuple[str, str]:
+    """
+    (digest, ext) of the normalized variant of an image, from the variant
+    cache when possible. A derived variant is stored right away; when the
+    original is kept, its digest is returned for the caller to store.
+    """
+    variant_key = cache_key(source_digest, images.VARIANT_PARAMS)
+
+    variant = _variant_index.get_json(variant_key)
+    if variant and (variant["digest"] == source_digest or _blobs.get_path(variant["digest"])):
+        return variant["digest"], variant["ext"]
+
+    result = images.normalize_image(src_path)
+    if result is None:
+        # Keep the original; remember that so it isn't reprocessed
+        _variant_index.put_json(variant_key, {"digest": source_digest, "ext": ext})
+        return source_digest, ext
+
+    derived, derived_ext = result
+    print(f"   Normalized image: {os.path.getsize(src_path)} -> {len(derived)} bytes")
+    derived_digest = hashlib.sha256(derived).hexdigest()
+    if _blobs.get_path(derived_digest) is None:
+        _blobs.put_bytes(derived_digest, derived)
+    _variant_index.put_json(variant_key, {"digest": derived_digest, "ext": derived_ext})
+    return derived_digest, derived_ext
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def materialize(blob_path: str, filename: str, public_dir: str, writable: bool = False):
+    """
+    Hardlink a blob into public_dir, and into public_dir/public/ for
+    staticFile() path ambiguity. Existing identical links are left alone.
+    With writable=True (directories an agent edits) private copies are
+    placed instead, so in-place rewrites can't reach the store.
+    """
+    for target_dir in (public_dir, os.path.join(public_dir, "public")):
+        dest = os.path.join(target_dir, filename)
+        if not writable and os.path.exists(dest) and os.path.samefile(dest, blob_path):
+            continue
+        link_or_copy(blob_path, dest, writable=writable)
@@ -1,21 +1,77 @@
 """
 assets.py - Download and place assets locally for Remotion rendering.
+
+Downloads go through the content-addressed asset store, so each URL is fetched
+once and projects receive hardlinks instead of fresh copies. Bodies are
+streamed to disk in chunks and capped at ASSET_MAX_BYTES, so memory use per
+download stays flat however large the remote file is.
 """
 import os
-import re
+import hashlib
 import shutil
-import requests
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import link_or_copy
+from src.httpclient import get_session
+from . import asset_store
+from .placeholders import parse_placeholder_url, placeholder_asset
+
+
+# Parallel downloads per props tree
+ASSET_DOWNLOAD_WORKERS = int(os.environ.get("ASSET_DOWNLOAD_WORKERS", "8"))
+# Larger downloads are abandoned (by Content-Length, or once the body passes it)
+ASSET_MAX_BYTES = int(os.environ.get("ASSET_MAX_BYTES", str(25 * 1024 * 1024)))
+_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# Anything smaller is an error page or tracking pixel, not a usable image
+_MIN_IMAGE_BYTES = 100
+
+EMPTY_ASSET_PLACEHOLDER = "https://placehold.co/1920x1080/CCCCCC/666666.png?text=No+Image+Available"
+INVALID_ASSET_PLACEHOLDER = "https://placehold.co/1920x1080/CCCCCC/666666.png?text=Placeholder"
 
 
 def upload_dynamic_assets(project_dir, props_data):
     """
     Traverses props_data to find image URLs, downloads them to the local
     Remotion project's public/ directory, and updates the JSON to use local filenames.
+
+    All references are collected first; each unique URL is fetched once, with
+    up to ASSET_DOWNLOAD_WORKERS downloads in flight, then the nodes are rewritten.
     """
     if not isinstance(props_data, dict):
         return
 
+    refs = _collect_asset_refs(props_data)
+    urls = list(dict.fromkeys(url for _, _, url in refs))
+    if not urls:
+        return
+
+    print(f"   Fetching {len(urls)} unique assets ({len(refs)} references)...")
+    filenames = dict(zip(urls, upload_assets(project_dir, urls)))
+
+    for node, key, url in refs:
+        if filenames.get(url):
+            node[key] = filenames[url]
+
+
+def upload_assets(project_dir, urls, writable=False):
+    """
+    Fetch URLs into {project_dir}/public/ with up to ASSET_DOWNLOAD_WORKERS
+    downloads in flight. Returns the filenames (None on failure) in URL order.
+    Pass writable=True when an agent may rewrite files in project_dir.
+    """
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(ASSET_DOWNLOAD_WORKERS, len(urls))) as pool:
+        return list(pool.map(lambda u: upload_single_asset(project_dir, u, writable), urls))
+
+
+def _collect_asset_refs(props_data) -> list[tuple[dict, str, str]]:
+    """
+    Find every asset reference in the props tree.
+    Returns (node, key, url) triples, with empty or invalid sources mapped to placeholders.
+    """
+    refs = []
+
     def process_node(node):
         if isinstance(node, dict):
             for k, v in node.items():
@@ -27,7 +83,7 @@ def upload_dynamic_assets(project_dir, props_data):
 
                     if not v or (isinstance(v, str) and not v.strip()):
                         print(f"   Warning: Found empty {k}, using placeholder")
-                        v = "https://placehold.co/1920x1080/CCCCCC/666666.png?text=No+Image+Available"
+                        v = EMPTY_ASSET_PLACEHOLDER
                         node[k] = v
 
                     if isinstance(v, str):
@@ -35,77 +91,56 @@ def upload_dynamic_assets(project_dir, props_data):
                             v = "https:" + v
 
                         if v.startswith("http://") or v.startswith("https://"):
-                            new_val = upload_single_asset(project_dir, v)
-                            if new_val:
-                                node[k] = new_val
+                            refs.append((node, k, v))
                         else:
                             print(f"   Warning: Found invalid asset source '{v}', replacing with placeholder")
-                            v = "https://placehold.co/1920x1080/CCCCCC/666666.png?text=Placeholder"
-                            new_val = upload_single_asset(project_dir, v)
-                            if new_val:
-                                node[k] = new_val
+                            refs.append((node, k, INVALID_ASSET_PLACEHOLDER))
 
         elif isinstance(node, list):
             for item in node:
                 process_node(item)
 
     process_node(props_data)
+    return refs
+
 
+# Fallback: minimal valid 1x1 gray PNG
+_FALLBACK_PNG = (
+    b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01'
+    b'\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde\x00'
+    b'\x00\x00\x0cIDATx\x9cc`\x00\x00\x00\x02\x00\x01'
+    b'\x2e\x1b\xe0\x1c\x00\x00\x00\x00IEND\xaeB`\x82'
+)
 
-def upload_single_asset(project_dir, url):
+
+def upload_single_asset(project_dir, url, writable=False):
     """
-    Downloads an image from a URL and saves it to {project_dir}/public/.
+    Fetches an image (from the asset store when this URL was seen before) and
+    hardlinks it into {project_dir}/public/ under a content-hash filename
+    (copies it, with writable=True). Placeholder-service URLs are rendered
+    locally instead of fetched.
     Returns the filename on success, None on failure.
     """
     try:
-        parsed = urlparse(url)
-        filename = os.path.basename(parsed.path)
-        if not filename or "." not in filename:
-            filename = f"asset_{abs(hash(url))}.png"
-
-        filename = re.sub(r'[^a-zA-Z0-9_.-]', '', filename)
-
-        # Fallback: minimal valid 1x1 gray PNG
-        valid_png_bytes = (
-            b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01'
-            b'\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde\x00'
-            b'\x00\x00\x0cIDATx\x9cc`\x00\x00\x00\x02\x00\x01'
-            b'\x2e\x1b\xe0\x1c\x00\x00\x00\x00IEND\xaeB`\x82'
-        )
-        content = valid_png_bytes
-
-        if url.startswith("http"):
-            try:
-                headers = {"User-Agent": "Mozilla/5.0"}
-                r = requests.get(url, headers=headers, timeout=10)
-                if r.status_code == 200 and len(r.content) > 100:
-                    is_png = r.content.startswith(b'\x89PNG')
-                    is_jpg = r.content.startswith(b'\xff\xd8')
-                    if is_png or is_jpg:
-                        content = r.content
-                        print(f"   Downloaded valid image ({len(content)} bytes)")
-                    else:
-                        print(f"   Warning: Not PNG/JPG, using fallback")
-                else:
-                    print(f"   Warning: Download failed ({r.status_code}), using placeholder")
-            except Exception as e:
-                print(f"   Warning: Download error ({e}), using placeholder")
-
-        # Save to public/
+        placeholder = parse_placeholder_url(url)
+        entry = asset_store.lookup(url) if placeholder is None else placeholder_asset(placeholder)
+        if placeholder is not None:
+            print(f"   Rendered placeholder locally: {placeholder['text']}")
+        elif entry is not None:
+            print(f"   Asset store hit: {url}")
+        else:
+            download = _download_image(url)
+            if download is None:
+                # Not indexed under the URL, so a later job retries the download
+                entry = asset_store.put(_FALLBACK_PNG, ".png")
+            else:
+                tmp_path, digest, ext = download
+                entry = asset_store.put_file(tmp_path, digest, ext, url=url, normalize=True)
+
+        blob_path, filename = entry
         public_dir = os.path.join(project_dir, "public")
-        os.makedirs(public_dir, exist_ok=True)
-        local_path = os.path.join(public_dir, filename)
-        with open(local_path, "wb") as f:
-            f.write(content)
-        print(f"   Saved asset to {local_path}")
-
-        # Also save to public/public/ for staticFile path ambiguity
-        nested_dir = os.path.join(public_dir, "public")
-        os.makedirs(nested_dir, exist_ok=True)
-        nested_path = os.path.join(nested_dir, filename)
-        with open(nested_path, "wb") as f:
-            f.write(content)
-
+        asset_store.materialize(blob_path, filename, public_dir, writable=writable)
+        print(f"   Linked asset {filename} into {public_dir}")
         return filename
 
     except Exception as e:
@@ -113,9 +148,88 @@ def upload_single_asset(project_dir, url):
     return None
 
 
+def _download_image(url):
+    """
+    Stream a PNG/JPG into a temp file in the asset store, hashing it on the way.
+    Returns (tmp_path, sha256 hex, ext), or None if it isn't a usable image.
+    """
+    if not url.startswith("http"):
+        return None
+    try:
+        headers = {"User-Agent": "Mozilla/5.0"}
+        with get_session().get(url, headers=headers, timeout=10, stream=True) as r:
+            if r.status_code != 200:
+                print(f"   Warning: Download failed ({r.status_code}), using placeholder")
+                return None
+            length = r.headers.get("Content-Length", "")
+            if length.isdigit() and int(length) > ASSET_MAX_BYTES:
+                print(f"   Warning: Asset too large ({length} bytes), using placeholder")
+                return None
+            return _stream_to_store(r)
+    except Exception as e:
+        print(f"   Warning: Download error ({e}), using placeholder")
+    return None
+
+
+def _stream_to_store(response):
+    """Write a response body to an asset store temp file. See _download_image."""
+    fd, tmp_path = asset_store.temp_file()
+    digest = hashlib.sha256()
+    head = b""
+    ext = None
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(_DOWNLOAD_CHUNK_BYTES):
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > ASSET_MAX_BYTES:
+                    print(f"   Warning: Asset exceeds {ASSET_MAX_BYTES} bytes, using placeholder")
+                    break
+                if ext is None:
+                    # Sniff the type as soon as the magic bytes are in
+                    head += chunk
+                    if len(head) >= 4:
+                        ext = _image_ext(head)
+                        if ext is None:
+                            print(f"   Warning: Not PNG/JPG, using fallback")
+                            break
+                        head = b""
+                digest.update(chunk)
+                f.write(chunk)
+            else:
+                if ext is not None and size > _MIN_IMAGE_BYTES:
+                    print(f"   Downloaded valid image ({size} bytes)")
+                    return tmp_path, digest.hexdigest(), ext
+                print(f"   Warning: Download too small ({size} bytes), using placeholder")
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    _remove(tmp_path)
+    return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _image_ext(content):
+    """File extension for PNG/JPG bytes, or None for anything else."""
+    if content.startswith(b'\x89PNG'):
+        return ".png"
+    if content.startswith(b'\xff\xd8'):
+        return ".jpg"
+    return None
+
+
 def upload_standard_assets(project_dir, props_data=None):
     """
-    Downloads standard placeholder assets AND dynamic assets to the local project.
+    Places standard placeholder assets (rendered locally) AND dynamic assets
+    in the local project.
     """
     assets = {
         "studio_ui.png": "https://placehold.co/1920x1080/1E88E5/FFFFFF.png?text=MotionForge+Studio+UI",
@@ -129,12 +243,10 @@ def upload_standard_assets(project_dir, props_data=None):
 
     for filename, url in assets.items():
         try:
-            r = requests.get(url, timeout=10)
-            if r.status_code == 200:
-                with open(os.path.join(public_dir, filename), "wb") as f:
-                    f.write(r.content)
-        except Exception:
-            pass
+            blob_path, _ = placeholder_asset(parse_placeholder_url(url))
+            link_or_copy(blob_path, os.path.join(public_dir, filename))
+        except Exception as e:
+            print(f"   Warning: Could not place {filename}: {e}")
 
     if props_data:
         print("Processing dynamic assets from props...")
@@ -7,8 +7,10 @@ background music into the Remotion project's public/ directory.
 
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from src.agents.elevenlabs import generate_voiceover
+from src.agents.elevenlabs import ELEVENLABS_CONCURRENCY, generate_voiceover_file
+from .mp3 import mp3_duration
 
 # Directory containing bundled background music loops
 _MUSIC_DIR = os.path.join(os.path.dirname(__file__), "music")
@@ -25,13 +27,19 @@ _MUSIC_FILES = {
 def generate_scene_voiceovers(storyboard, output_dir: str) -> list[dict]:
     """
     Generate voiceover MP3 files for each scene that has a voiceover_script.
+    Scenes are synthesized concurrently; TTS requests across all jobs are
+    capped at ELEVENLABS_CONCURRENCY (see elevenlabs.py). Each file is
+    written as soon as its audio arrives.
 
     Args:
         storyboard: A VideoStoryboard (pydantic model or dict).
         output_dir: Directory to write MP3 files (typically work_dir/public/).
 
     Returns:
-        List of metadata dicts: [{scene_number, filename, duration_estimate, script}, ...]
+        List of metadata dicts in scene order:
+        [{scene_number, filename, duration_seconds, duration_estimate, script}, ...]
+        duration_seconds is measured from the MP3 frame headers, falling back
+        to the word-count estimate if the file can't be parsed.
     """
     os.makedirs(output_dir, exist_ok=True)
 
@@ -40,42 +48,59 @@ def generate_scene_voiceovers(storyboard, output_dir: str) -> list[dict]:
     else:
         sb = storyboard
 
-    scenes = sb.get("scenes", [])
-    audio_metadata = []
-
-    for scene in scenes:
-        script = scene.get("voiceover_script", "").strip()
-        scene_num = scene.get("scene_number", 0)
-
-        if not script:
-            continue
-
-        filename = f"voiceover_scene_{scene_num}.mp3"
-        filepath = os.path.join(output_dir, filename)
-
-        try:
-            print(f"[audio] Generating voiceover for Scene {scene_num}: \"{script[:60]}...\"")
-            audio_bytes = generate_voiceover(script)
-            with open(filepath, "wb") as f:
-                f.write(audio_bytes)
-
-            # Rough duration estimate: ~150 words/min, average 5 chars/word
-            word_count = len(script.split())
-            duration_estimate = round(word_count / 2.5, 1)  # seconds
-
-            audio_metadata.append({
-                "scene_number": scene_num,
-                "filename": filename,
-                "duration_estimate": duration_estimate,
-                "script": script,
-            })
-            print(f"[audio] Scene {scene_num} voiceover saved: {filename}")
-
-        except Exception as e:
-            print(f"[audio] Warning: Failed to generate voiceover for Scene {scene_num}: {e}")
-            # Graceful fallback — scene simply has no voiceover
-
-    return audio_metadata
+    scenes = [
+        (order, scene) for order, scene in enumerate(sb.get("scenes", []))
+        if scene.get("voiceover_script", "").strip()
+    ]
+    if not scenes:
+        return []
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(ELEVENLABS_CONCURRENCY, len(scenes)))) as pool:
+        futures = {
+            pool.submit(_generate_scene_voiceover, scene, output_dir): order
+            for order, scene in scenes
+        }
+        for future in as_completed(futures):
+            metadata = future.result()
+            if metadata:
+                results[futures[future]] = metadata
+
+    return [results[order] for order in sorted(results)]
+
+
+def _generate_scene_voiceover(scene: dict, output_dir: str) -> dict | None:
+    """Synthesize and write one scene's voiceover. Returns its metadata, or None on failure."""
+    script = scene.get("voiceover_script", "").strip()
+    scene_num = scene.get("scene_number", 0)
+
+    filename = f"voiceover_scene_{scene_num}.mp3"
+    filepath = os.path.join(output_dir, filename)
+
+    try:
+        print(f"[audio] Generating voiceover for Scene {scene_num}: \"{script[:60]}...\"")
+        generate_voiceover_file(script, filepath)
+
+        # Rough duration estimate: ~150 words/min, average 5 chars/word
+        word_count = len(script.split())
+        duration_estimate = round(word_count / 2.5, 1)  # seconds
+
+        measured = mp3_duration(filepath)
+        duration_seconds = round(measured, 2) if measured else duration_estimate
+
+        print(f"[audio] Scene {scene_num} voiceover saved: {filename} ({duration_seconds}s)")
+        return {
+            "scene_number": scene_num,
+            "filename": filename,
+            "duration_seconds": duration_seconds,
+            "duration_estimate": duration_estimate,
+            "script": script,
+        }
+
+    except Exception as e:
+        print(f"[audio] Warning: Failed to generate voiceover for Scene {scene_num}: {e}")
+        # Graceful fallback — scene simply has no voiceover
+        return None
 
 
 def prepare_background_music(music_style: str, output_dir: str) -> str | None:
@@ -0,0 +1,218 @@
+"""
+code_cache.py - Reuse Cline-generated Remotion code across equivalent storyboards.
+
+After a successful agentic run, the generated src/ tree is stored together
+with the storyboard content it was written for. The index key is a
+structural fingerprint of the storyboard:
+  - scene names and frame counts
+  - number of images
+  - size of the color palette
+
+A later storyboard with the same fingerprint is a near-match. When the
+code is stored, every place it holds swappable content is recorded as a
+slot (file, offsets, storyboard field, literal kind). On a near-match each
+slot is filled with the new storyboard's value, escaped for its literal,
+and the result is rendered directly without Cline. Slots cover:
+  - headlines, supporting text, CTA and product name
+  - image filenames (by image position)
+  - palette colors (hex codes, by palette position)
+
+Texts and filenames only count as slots when they are the whole of a
+string literal or a JSX text node, so a CTA of "Go" never rewrites
+"Google". Code is only cached when every scene text has a slot, and not
+at all when two fields share a value, since a later storyboard could give
+them different ones. If a parameterized render fails, the caller falls
+back to Cline.
+"""
+
+import os
+import re
+import json
+
+from src.cache import DiskCache, cache_key
+
+CLINE_CODE_CACHE = os.environ.get("CLINE_CODE_CACHE", "1") == "1"
+CLINE_CODE_CACHE_MAX_ENTRIES = int(os.environ.get("CLINE_CODE_CACHE_MAX_ENTRIES", "200"))
+
+# Bump when the brief changes in ways that make older code unsuitable
+CODE_FORMAT_VERSION = 2
+
+_code = DiskCache("cline-code", max_entries=CLINE_CODE_CACHE_MAX_ENTRIES, suffix=".json")
+
+# Only code is cached and replaced; fonts/images in src/ stay as cloned
+_SOURCE_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".json", ".css")
+_HEX_COLOR_RE = re.compile(r"#(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{3})\b")
+_QUOTES = ('"', "'", "`")
+# Characters JSX text can't hold literally
+_JSX_SPECIAL_RE = re.compile(r"[{}<>&\n]")
+
+
+def fingerprint(storyboard: dict, images: list[str], fps: int = 30) -> str:
+    """Structural fingerprint: what the code hardcodes besides swappable content."""
+    return cache_key(
+        CODE_FORMAT_VERSION,
+        [
+            (re.sub(r"[^a-z0-9]", "", s.get("scene_name", "").lower()), int(s.get("duration_seconds", 4) * fps))
+            for s in storyboard.get("scenes", [])
+        ],
+        len(images),
+        len(storyboard.get("color_palette", [])),
+    )
+
+
+def lookup(storyboard: dict, images: list[str]) -> dict[str, str] | None:
+    """
+    Parameterized src/ files ({relpath: text}) for a near-matching storyboard,
+    or None on a miss.
+    """
+    entry = _code.get_json(fingerprint(storyboard, images))
+    if not entry:
+        return None
+
+    files = {}
+    for relpath, text in entry["files"].items():
+        parts = []
+        last = 0
+        for start, end, field, kind in entry["slots"].get(relpath, []):
+            parts.append(text[last:start])
+            parts.append(_escape(_field_value(storyboard, images, field), kind))
+            last = end
+        parts.append(text[last:])
+        files[relpath] = "".join(parts)
+    return files
+
+
+def store(work_dir: str, storyboard: dict, images: list[str]) -> bool:
+    """
+    Remember the src/ tree Cline wrote for this storyboard. Skipped (returns
+    False) when some scene text isn't a literal in the code, or when fields
+    share a value, since a later job couldn't swap them out reliably.
+    """
+    files = _read_tree(os.path.join(work_dir, "src"))
+    if not files:
+        return False
+
+    fields = _fields(storyboard, images)
+    values = [text.lower() if field.startswith("color_palette.") else text for field, text, _ in fields]
+    if len(set(values)) != len(values):
+        print("[code-cache] Not caching: storyboard fields share values")
+        return False
+
+    slots = {relpath: _find_slots(code, fields) for relpath, code in files.items()}
+    found = {slot[2] for file_slots in slots.values() for slot in file_slots}
+    missing = [field for field, _, required in fields if required and field not in found]
+    if missing:
+        print(f"[code-cache] Not caching: {len(missing)} storyboard texts aren't literals in the code")
+        return False
+
+    _code.put_json(fingerprint(storyboard, images), {
+        "files": files,
+        "slots": {relpath: file_slots for relpath, file_slots in slots.items() if file_slots},
+    })
+    print(f"[code-cache] Stored generated code ({len(files)} files, {len(found)} fields)")
+    return True
+
+
+def write_tree(src_dir: str, files: dict[str, str]):
+    """Replace the source files under src_dir with the given ones."""
+    for root, _, names in os.walk(src_dir):
+        for name in names:
+            if name.endswith(_SOURCE_EXTENSIONS):
+                os.remove(os.path.join(root, name))
+    for relpath, text in files.items():
+        path = os.path.join(src_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def stats() -> dict:
+    return _code.stats()
+
+
+def _fields(storyboard: dict, images: list[str]) -> list[tuple[str, str, bool]]:
+    """(field, value, required) for every swappable value in the storyboard."""
+    fields = []
+    for i, scene in enumerate(storyboard.get("scenes", [])):
+        for name in ("headline_text", "supporting_text"):
+            if scene.get(name):
+                fields.append((f"scenes.{i}.{name}", scene[name], True))
+    if storyboard.get("closing_cta"):
+        fields.append(("closing_cta", storyboard["closing_cta"], True))
+    if storyboard.get("product_name"):
+        # Often only appears inside a headline; swapped wherever it stands alone
+        fields.append(("product_name", storyboard["product_name"], False))
+    fields += [(f"images.{i}", name, False) for i, name in enumerate(images)]
+    fields += [(f"color_palette.{i}", color, False) for i, color in enumerate(storyboard.get("color_palette", []))]
+    return fields
+
+
+def _field_value(storyboard: dict, images: list[str], field: str) -> str:
+    name, _, rest = field.partition(".")
+    if name == "scenes":
+        index, _, key = rest.partition(".")
+        return storyboard["scenes"][int(index)].get(key) or ""
+    if name == "images":
+        return images[int(rest)]
+    if name == "color_palette":
+        return storyboard["color_palette"][int(rest)]
+    return storyboard.get(name) or ""
+
+
+def _find_slots(code: str, fields: list[tuple[str, str, bool]]) -> list[list]:
+    """
+    [start, end, field, kind] for each place a field's value is the whole of
+    a string literal (kind '"', "'" or '`') or JSX text node (kind 'jsx'),
+    plus palette colors anywhere (kind 'raw'). Sorted, non-overlapping.
+    """
+    slots = []
+    colors = {}
+    for field, text, _ in fields:
+        if field.startswith("color_palette."):
+            colors[text.lower()] = field
+            continue
+        for kind in _QUOTES:
+            # The quote must not itself be escaped
+            pattern = rf"(?<=[^\\]{re.escape(kind)}){re.escape(_escape(text, kind))}(?={re.escape(kind)})"
+            slots += [[m.start(), m.end(), field, kind] for m in re.finditer(pattern, code)]
+        if not _JSX_SPECIAL_RE.search(text):
+            pattern = rf"(?<=>)(\s*)({re.escape(text)})\s*(?=<)"
+            slots += [[m.start(2), m.end(2), field, "jsx"] for m in re.finditer(pattern, code)]
+    for m in _HEX_COLOR_RE.finditer(code):
+        field = colors.get(m.group(0).lower())
+        if field:
+            slots.append([m.start(), m.end(), field, "raw"])
+
+    slots.sort()
+    result = []
+    for slot in slots:
+        if not result or slot[0] >= result[-1][1]:
+            result.append(slot)
+    return result
+
+
+def _escape(text: str, kind: str) -> str:
+    """text as the body of a literal of the given kind."""
+    if kind == '"':
+        return json.dumps(text, ensure_ascii=False)[1:-1]
+    if kind == "'":
+        return text.replace("\\", "\\\\").replace("'", "\\'").replace("\n", "\\n")
+    if kind == "`":
+        return text.replace("\\", "\\\\").replace("`", "\\`").replace("${", "\\${")
+    if kind == "jsx" and _JSX_SPECIAL_RE.search(text):
+        # Not expressible as JSX text; use an expression container instead
+        return "{" + json.dumps(text, ensure_ascii=False) + "}"
+    return text
+
+
+def _read_tree(src_dir: str) -> dict[str, str]:
+    files = {}
+    for root, dirs, names in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(names):
+            if not name.endswith(_SOURCE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "r", errors="replace") as f:
+                files[os.path.relpath(path, src_dir)] = f.read()
+    return files
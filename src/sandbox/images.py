@@ -0,0 +1,102 @@
+"""
+images.py - Normalize downloaded images before render.
+
+Scraped og:images and gallery shots are often multi-megabyte PNGs far larger
+than the composition, and Remotion's headless browser decodes them on every
+frame it composites. Each image is downscaled to fit the composition, has
+EXIF orientation applied and metadata stripped, and is re-encoded as JPEG
+(opaque) or optimized PNG (with transparency). The work runs in a process
+pool so it never holds the GIL of the API process.
+
+Requires Pillow; without it images are used exactly as downloaded.
+"""
+
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+IMAGE_NORMALIZE = os.environ.get("IMAGE_NORMALIZE", "1") == "1"
+COMPOSITION_WIDTH = int(os.environ.get("COMPOSITION_WIDTH", "1920"))
+COMPOSITION_HEIGHT = int(os.environ.get("COMPOSITION_HEIGHT", "1080"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "88"))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Everything that affects the output; part of the derived-variant cache key.
+# Bump the version when the transform itself changes.
+VARIANT_PARAMS = {
+    "version": 1,
+    "width": COMPOSITION_WIDTH,
+    "height": COMPOSITION_HEIGHT,
+    "quality": IMAGE_JPEG_QUALITY,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def normalize_available() -> bool:
+    return IMAGE_NORMALIZE and Image is not None
+
+
+def normalize_image(path: str) -> tuple[bytes, str] | None:
+    """
+    Normalized (bytes, ext) for the image at path, or None to keep the original
+    (Pillow missing, undecodable input, or no gain from re-encoding).
+    """
+    if not normalize_available():
+        return None
+    try:
+        return _get_pool().submit(
+            _transform, path, COMPOSITION_WIDTH, COMPOSITION_HEIGHT, IMAGE_JPEG_QUALITY,
+        ).result()
+    except Exception as e:
+        print(f"   Warning: Image normalization failed ({e}), using original")
+        return None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """The shared worker pool, created on first use by whichever download thread gets there first."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the API process is multi-threaded
+                _pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _transform(path: str, width: int, height: int, quality: int) -> tuple[bytes, str] | None:
+    """Runs in a worker process, which reads the source file itself."""
+    with Image.open(path) as im:
+        im = ImageOps.exif_transpose(im)
+        resized = im.width > width or im.height > height
+        if resized:
+            im.thumbnail((width, height), Image.LANCZOS)
+
+        has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+        out = io.BytesIO()
+        # convert() copies im.info, and the PNG encoder writes any
+        # icc_profile it finds there; JPEG only writes what it's passed
+        im.info.pop("icc_profile", None)
+        im.info.pop("exif", None)
+        if has_alpha:
+            im.convert("RGBA").save(out, "PNG", optimize=True)
+            ext = ".png"
+        else:
+            im.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+            ext = ".jpg"
+
+    data = out.getvalue()
+    if not resized and len(data) >= os.path.getsize(path):
+        return None
+    return data, ext
@@ -0,0 +1,148 @@
+"""
+mp3.py - Exact MP3 duration from frame headers, without decoding audio.
+
+Reads the Xing/Info or VBRI header when the encoder wrote one (ElevenLabs
+does), otherwise walks the frame headers, seeking past each frame's payload.
+Only a few bytes per frame are ever read.
+"""
+
+import struct
+
+# Bitrates in kbps, indexed by [version_key][layer][bitrate_index]
+_BITRATES = {
+    "mpeg1": {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    "mpeg2": {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+
+# Sample rates indexed by the header's version bits, then sample-rate index
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+# Give up resyncing after this many junk bytes between frames
+_MAX_RESYNC_BYTES = 64 * 1024
+
+
+def _parse_header(header: bytes):
+    """
+    Decode a 4-byte frame header.
+    Returns (frame_length, samples_per_frame, sample_rate, version_bits, mono) or None.
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    mono = (header[3] >> 6) == 0x03
+
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    version_key = "mpeg1" if version_bits == 3 else "mpeg2"
+    bitrate = _BITRATES[version_key][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or version_bits == 3) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    return length, samples, sample_rate, version_bits, mono
+
+
+def _skip_id3v2(f) -> int:
+    """Return the offset of the first byte after any ID3v2 tag."""
+    f.seek(0)
+    head = f.read(10)
+    if len(head) == 10 and head[:3] == b"ID3":
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        footer = 10 if head[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_frame(f, offset: int):
+    """Scan forward from offset for a frame header that is followed by another."""
+    f.seek(offset)
+    window = f.read(_MAX_RESYNC_BYTES + 4)
+    for i in range(len(window) - 3):
+        if window[i] != 0xFF:
+            continue
+        parsed = _parse_header(window[i:i + 4])
+        if parsed is None:
+            continue
+        f.seek(offset + i + parsed[0])
+        following = f.read(4)
+        # Last frame in the file, or a real frame followed by another one
+        if len(following) < 4 or _parse_header(following) is not None:
+            return offset + i, parsed
+    return None, None
+
+
+def _vbr_frame_count(frame: bytes, version_bits: int, mono: bool) -> int | None:
+    """Total frame count from a Xing/Info or VBRI header in the first frame."""
+    if version_bits == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    xing = 4 + side_info
+    tag = frame[xing:xing + 4]
+    if tag in (b"Xing", b"Info") and len(frame) >= xing + 12:
+        flags = struct.unpack(">I", frame[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack(">I", frame[xing + 8:xing + 12])[0]
+    if frame[36:40] == b"VBRI" and len(frame) >= 54:
+        return struct.unpack(">I", frame[50:54])[0]
+    return None
+
+
+def mp3_duration(path: str) -> float | None:
+    """
+    Duration of an MP3 file in seconds, or None if no MPEG audio frames are found.
+    """
+    with open(path, "rb") as f:
+        offset, parsed = _find_frame(f, _skip_id3v2(f))
+        if parsed is None:
+            return None
+
+        length, samples, sample_rate, version_bits, mono = parsed
+        f.seek(offset)
+        first_frame = f.read(length)
+        frame_count = _vbr_frame_count(first_frame, version_bits, mono)
+        if frame_count:
+            return frame_count * samples / sample_rate
+
+        # No VBR header: walk the frames. The first frame counts as audio here.
+        total_samples = 0
+        position = offset
+        while True:
+            f.seek(position)
+            header = f.read(4)
+            if len(header) < 4 or header[:3] == b"TAG":
+                break
+            frame = _parse_header(header)
+            if frame is None:
+                position, frame = _find_frame(f, position + 1)
+                if frame is None:
+                    break
+            total_samples += frame[1]
+            position += frame[0]
+            sample_rate = frame[2]
+
+        return total_samples / sample_rate if total_samples else None
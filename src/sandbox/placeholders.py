@@ -0,0 +1,128 @@
+"""
+placeholders.py - Render placeholder images locally instead of fetching placehold.co.
+
+Understands placehold.co-style URLs (/{w}x{h}/{bg}/{fg}.png?text=...), which is
+what the Director agent is told to use for missing images, and renders the
+same solid-color + centered-text PNG in-process. Text needs Pillow; without
+it the placeholder is a plain solid-color PNG. Each (size, colors, text) is
+rendered once and then served from the asset store.
+"""
+
+import io
+import re
+import struct
+import zlib
+from urllib.parse import urlparse, parse_qs
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+from . import asset_store
+
+PLACEHOLDER_HOSTS = ("placehold.co", "via.placeholder.com", "placehold.it")
+DEFAULT_BACKGROUND = "CCCCCC"
+DEFAULT_FOREGROUND = "666666"
+_MAX_SIDE = 4000
+
+_SIZE_RE = re.compile(r"^(\d+)(?:x(\d+))?$")
+_HEX_RE = re.compile(r"^(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
+
+
+def parse_placeholder_url(url: str) -> dict | None:
+    """
+    Placeholder spec {width, height, background, foreground, text} for a
+    placeholder-service URL, or None if url isn't one.
+    """
+    parsed = urlparse(url)
+    if (parsed.hostname or "").lower() not in PLACEHOLDER_HOSTS:
+        return None
+
+    parts = [p for p in parsed.path.split("/") if p]
+    if not parts:
+        return None
+    # The format suffix may sit on any segment: /600x400.png, /600x400/fff/000.png
+    parts = [re.sub(r"\.(png|jpe?g|gif|webp|svg)$", "", p, flags=re.IGNORECASE) for p in parts]
+
+    size = _SIZE_RE.match(parts[0])
+    if not size:
+        return None
+    width = min(int(size.group(1)), _MAX_SIDE)
+    height = min(int(size.group(2) or size.group(1)), _MAX_SIDE)
+
+    background = parts[1] if len(parts) > 1 and _HEX_RE.match(parts[1]) else DEFAULT_BACKGROUND
+    foreground = parts[2] if len(parts) > 2 and _HEX_RE.match(parts[2]) else DEFAULT_FOREGROUND
+    text = parse_qs(parsed.query).get("text", [f"{width} x {height}"])[0]
+
+    return {
+        "width": width,
+        "height": height,
+        "background": background.upper(),
+        "foreground": foreground.upper(),
+        "text": text,
+    }
+
+
+def placeholder_asset(spec: dict) -> tuple[str, str]:
+    """(blob_path, filename) of the rendered placeholder, rendering it on first use."""
+    key = "placeholder:{width}x{height}/{background}/{foreground}/{text}".format(**spec)
+    entry = asset_store.lookup(key)
+    if entry is None:
+        entry = asset_store.put(render_placeholder(**spec), ".png", url=key)
+    return entry
+
+
+def render_placeholder(width: int, height: int, background: str, foreground: str, text: str = "") -> bytes:
+    """PNG bytes of a solid background with centered text."""
+    bg = _hex_to_rgb(background)
+    if Image is None:
+        return _solid_png(width, height, bg)
+
+    im = Image.new("RGB", (width, height), bg)
+    if text:
+        draw = ImageDraw.Draw(im)
+        font = _font(max(12, height // 12))
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+        draw.text(
+            ((width - (right - left)) / 2 - left, (height - (bottom - top)) / 2 - top),
+            text,
+            fill=_hex_to_rgb(foreground),
+            font=font,
+        )
+    out = io.BytesIO()
+    im.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1: fixed-size bitmap font only
+        return ImageFont.load_default()
+
+
+def _hex_to_rgb(value: str) -> tuple[int, int, int]:
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _solid_png(width: int, height: int, rgb: tuple[int, int, int]) -> bytes:
+    """Minimal truecolor PNG of a single color, using only the stdlib."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data)) + tag + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+        )
+
+    row = b"\x00" + bytes(rgb) * width
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(row * height, 9))
+        + chunk(b"IEND", b"")
+    )
+
@@ -2,8 +2,8 @@
 render.py - Render Remotion video locally using either templated or agentic mode.
 
 Modes (controlled by RENDER_MODE env var):
-  - "templated": Copies props/assets into a pre-cloned Remotion project and runs
-                 `npx remotion render` directly via subprocess.
+  - "templated": Renders a pre-cloned Remotion project with per-job props and
+                 assets by running `npx remotion render` directly via subprocess.
   - "agentic":   Scrapes the target URL, writes a creative brief, invokes Cline CLI
                  headlessly to create a brand-new Remotion video from scratch and render it.
                  Cline has full creative freedom — no existing template is used.
@@ -14,13 +14,19 @@ Exposes `render_video(...)` for programmatic use.
 import os
 import sys
 import json
+import math
+import hashlib
+import re
 import shutil
 import asyncio
 import subprocess
 import tempfile
 from dotenv import load_dotenv
-from .assets import upload_standard_assets
+from src.cache import link_or_copy
+from . import code_cache, render_server, segments, workdirs
+from .assets import upload_assets, upload_standard_assets
 from .audio import generate_scene_voiceovers, prepare_background_music
+from .supervisor import CLINE_TIMEOUT_SECONDS, ClineSupervisor
 
 load_dotenv()
 
@@ -29,6 +35,51 @@ REMOTION_PROJECT_DIR = os.path.expanduser(
     os.environ.get("REMOTION_PROJECT_DIR", "~/remotion-demo-2")
 )
 DEFAULT_PROPS_FILE = "showcase-props.json"
+# Per-job props, public/ and out/ for templated renders
+TEMPLATED_WORK_ROOT = os.path.expanduser("~/.remotion-templated")
+COMPOSITION_ID = "PromoVideo"
+# Published videos are named {stem}.{sha256[:12]}.mp4
+PUBLISHED_VIDEO_RE = re.compile(r"\.[0-9a-f]{12}\.mp4$")
+
+# Render long videos as parallel frame-range chunks joined losslessly
+RENDER_CHUNKED = os.environ.get("RENDER_CHUNKED", "1") == "1"
+# Parallel Remotion processes per render (each drives its own browser)
+RENDER_CHUNK_WORKERS = int(os.environ.get("RENDER_CHUNK_WORKERS", str(os.cpu_count() or 1)))
+# Shorter chunks spend more time starting up than rendering
+RENDER_MIN_CHUNK_FRAMES = int(os.environ.get("RENDER_MIN_CHUNK_FRAMES", "60"))
+
+# Silence kept after each voiceover before the scene cuts
+VOICEOVER_TAIL_SECONDS = 1.0
+
+
+def _job_id_from_props(local_props_path: str) -> str:
+    """Job id embedded in a temp_props_{job_id}.json file name."""
+    return os.path.basename(local_props_path).replace("temp_props_", "").replace(".json", "")
+
+
+def _publish_output(video_path: str, output_name: str) -> str:
+    """
+    Move a rendered video into outputs/ under a content-hashed name
+    ({stem}.{sha256[:12]}.mp4), so it can be served as immutable.
+    The file is renamed, not copied, unless outputs/ is on another filesystem.
+    Returns the published path.
+    """
+    digest = hashlib.sha256()
+    with open(video_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    stem, ext = os.path.splitext(output_name)
+    os.makedirs("outputs", exist_ok=True)
+    published = os.path.abspath(os.path.join("outputs", f"{stem}.{digest.hexdigest()[:12]}{ext}"))
+    try:
+        os.replace(video_path, published)
+    except OSError:
+        # Across filesystems: copy under a temp name so the final name appears whole
+        tmp_path = published + ".tmp"
+        shutil.copyfile(video_path, tmp_path)
+        os.replace(tmp_path, published)
+    return published
 
 
 def _output_name_from_props(local_props_path: str) -> str:
@@ -47,13 +98,15 @@ async def render_video(
     url: str | None = None,
     scraped_data: dict | None = None,
     storyboard=None,
+    on_progress=None,
 ) -> str:
     """
     Render a Remotion video locally.
 
     In templated mode, uses local_props_path (pre-generated ShowcaseProps JSON).
     In agentic mode, uses a storyboard (from the Creative Director agent) to
-    give Cline a detailed scene-by-scene plan to implement.
+    give Cline a detailed scene-by-scene plan to implement, and reports its
+    milestones through on_progress(stage, detail) (see supervisor.py).
 
     Returns the absolute path to the rendered .mp4 file.
     """
@@ -62,6 +115,7 @@ async def render_video(
     if RENDER_MODE == "agentic":
         return await _render_agentic(
             local_props_path, url=url, scraped_data=scraped_data, storyboard=storyboard,
+            on_progress=on_progress,
         )
     else:
         if not os.path.exists(local_props_path):
@@ -74,7 +128,13 @@ async def render_video(
 # ---------------------------------------------------------------------------
 
 async def _render_templated(local_props_path: str) -> str:
-    """Copy props + assets into the local Remotion project and render."""
+    """
+    Render the template with this job's props.
+
+    Each job gets its own directory holding its props, public/ assets and
+    output, handed to `npx remotion render` via --props and --public-dir, so
+    any number of templated jobs can render from one checkout at once.
+    """
     project_dir = REMOTION_PROJECT_DIR
     if not os.path.isdir(project_dir):
         raise FileNotFoundError(
@@ -86,65 +146,288 @@ async def _render_templated(local_props_path: str) -> str:
     with open(local_props_path, "r") as f:
         props_data = json.load(f)
 
-    # Download assets into project public/
-    upload_standard_assets(project_dir, props_data)
+    output_name = _output_name_from_props(local_props_path)
+    job_dir = os.path.join(TEMPLATED_WORK_ROOT, f"job-{_job_id_from_props(local_props_path)}")
+    if os.path.exists(job_dir):
+        await asyncio.to_thread(shutil.rmtree, job_dir)
+    public_dir = os.path.join(job_dir, "public")
+    try:
+        # Template public/ (fonts, static images) by hardlink, then this job's assets.
+        # Blocking file and HTTP work, keep it off the event loop.
+        await asyncio.to_thread(_link_tree, os.path.join(project_dir, "public"), public_dir)
+        await asyncio.to_thread(upload_standard_assets, job_dir, props_data)
+
+        # Write updated props (with local asset filenames) back, and into the job dir
+        with open(local_props_path, "w") as f:
+            json.dump(props_data, f, indent=2)
+        job_props_path = os.path.join(job_dir, "props.json")
+        shutil.copy(local_props_path, job_props_path)
+
+        out_dir = os.path.join(job_dir, "out")
+        os.makedirs(out_dir, exist_ok=True)
+        remote_output = os.path.join(out_dir, output_name)
+
+        print(f"Starting render -> {output_name}")
+        print("-" * 60)
+        await _render_composition(project_dir, remote_output, job_props_path, public_dir)
+        print("-" * 60)
+
+        print("Render finished.")
+
+        local_video_path = await asyncio.to_thread(_publish_output, remote_output, output_name)
+
+        size = os.path.getsize(local_video_path)
+        print(f"Output: {local_video_path} ({size / 1024 / 1024:.2f} MB)")
+    finally:
+        # Also on failure: job ids are unique, so nothing else would reclaim it
+        try:
+            if os.path.exists(job_dir):
+                await asyncio.to_thread(shutil.rmtree, job_dir)
+        except Exception as e:
+            print(f"Warning: could not clean up {job_dir}: {e}")
 
-    # Write updated props (with local asset filenames) back
-    with open(local_props_path, "w") as f:
-        json.dump(props_data, f, indent=2)
+    return local_video_path
 
-    # Copy props to project config location
-    remote_props_path = os.path.join(project_dir, "src", "configs", "signal.json")
-    os.makedirs(os.path.dirname(remote_props_path), exist_ok=True)
-    shutil.copy(local_props_path, remote_props_path)
-    print(f"Copied props to {remote_props_path}")
 
-    # Determine output name
-    output_name = _output_name_from_props(local_props_path)
-    out_dir = os.path.join(project_dir, "out")
-    os.makedirs(out_dir, exist_ok=True)
-    remote_output = os.path.join(out_dir, output_name)
-
-    # Build render command
-    render_cmd = [
-        "npx", "remotion", "render",
-        "PromoVideo",
-        f"out/{output_name}",
-        f"--props={remote_props_path}",
-        "--concurrency=1",
-    ]
+def _link_tree(src_dir: str, dest_dir: str):
+    """Recreate src_dir's tree at dest_dir with hardlinked files."""
+    os.makedirs(dest_dir, exist_ok=True)
+    for root, _, files in os.walk(src_dir):
+        target = os.path.join(dest_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            link_or_copy(os.path.join(root, name), os.path.join(target, name))
 
-    print(f"Starting render -> {output_name}")
-    print("-" * 60)
 
+# ---------------------------------------------------------------------------
+# Remotion render (single pass or chunked)
+# ---------------------------------------------------------------------------
+
+async def _render_composition(
+    project_dir: str,
+    output_path: str,
+    props_path: str | None = None,
+    public_dir: str | None = None,
+    use_server: bool = True,
+):
+    """
+    Render the composition to output_path. The warm render server is tried
+    first (RENDER_SERVER, templated renders only). Otherwise, with
+    RENDER_CHUNKED, long videos are split into frame ranges rendered by
+    parallel Remotion processes and concatenated without re-encoding;
+    failing that, one process renders everything.
+    """
+    if use_server and render_server.RENDER_SERVER:
+        try:
+            await render_server.render(
+                project_dir, COMPOSITION_ID, props_path, output_path, public_dir,
+                concurrency=RENDER_CHUNK_WORKERS,
+            )
+            return
+        except Exception as e:
+            print(f"Warning: render server failed ({e}), falling back to the Remotion CLI")
+
+    options = []
+    if props_path:
+        options.append(f"--props={props_path}")
+    if public_dir:
+        options.append(f"--public-dir={public_dir}")
+
+    if RENDER_CHUNKED and RENDER_CHUNK_WORKERS > 1:
+        try:
+            if await _render_chunked(project_dir, output_path, options):
+                return
+        except Exception as e:
+            print(f"Warning: chunked render failed ({e}), rendering in one pass")
+
+    returncode = await _run_logged(
+        ["npx", "remotion", "render", COMPOSITION_ID, output_path, *options,
+         f"--concurrency={RENDER_CHUNK_WORKERS}"],
+        cwd=project_dir,
+    )
+    if returncode != 0:
+        raise RuntimeError(f"Remotion render failed with exit code {returncode}")
+
+
+async def _render_chunked(project_dir: str, output_path: str, options: list[str]) -> bool:
+    """
+    Render frame-range chunks (video only) and the audio track in parallel,
+    then join them with ffmpeg's concat demuxer (stream copy).
+    Returns False without rendering if the video is too short to split.
+    """
+    work_dir = output_path + ".chunks"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        serve = await _bundle(project_dir, work_dir, options)
+        total_frames = await _composition_frames(project_dir, serve, options)
+        if total_frames is None:
+            return False
+        ranges = _frame_ranges(total_frames, RENDER_CHUNK_WORKERS, RENDER_MIN_CHUNK_FRAMES)
+        if len(ranges) < 2:
+            return False
+
+        print(f"Rendering {total_frames} frames in {len(ranges)} parallel chunks")
+        chunks = [
+            (os.path.join(work_dir, f"chunk_{i:03d}.mp4"), first, last, f"chunk {i}")
+            for i, (first, last) in enumerate(ranges)
+        ]
+        audio_path = await _render_ranges(project_dir, serve, options, chunks, work_dir)
+        await _concat([path for path, *_ in chunks], audio_path, output_path, project_dir, work_dir)
+        return True
+    finally:
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
+
+async def _render_segmented(project_dir: str, output_path: str, plan: list[dict]) -> bool:
+    """
+    Render the video scene by scene (see segments.py): cached segments are
+    reused, the rest are rendered in parallel, and all are joined with the
+    audio track without re-encoding. Returns False without rendering if the
+    composition doesn't line up with the planned scenes.
+    """
+    work_dir = output_path + ".segments"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        serve = await _bundle(project_dir, work_dir, [])
+        total_frames = await _composition_frames(project_dir, serve, [])
+        planned_frames = plan[-1]["last"] + 1
+        if total_frames != planned_frames:
+            print(f"[segments] Composition has {total_frames} frames, storyboard {planned_frames}; rendering in one piece")
+            return False
+
+        paths = [segments.lookup(segment["key"]) for segment in plan]
+        missing = [
+            (os.path.join(work_dir, f"scene_{segment['scene_number']}.mp4"),
+             segment["first"], segment["last"], f"scene {segment['scene_number']}")
+            for segment, path in zip(plan, paths) if path is None
+        ]
+        print(f"[segments] {len(plan) - len(missing)}/{len(plan)} scenes cached, rendering {len(missing)}")
+        audio_path = await _render_ranges(project_dir, serve, [], missing, work_dir)
+
+        rendered = iter(missing)
+        for i, segment in enumerate(plan):
+            if paths[i] is None:
+                paths[i] = segments.store(segment["key"], next(rendered)[0])
+        await _concat(paths, audio_path, output_path, project_dir, work_dir)
+        return True
+    finally:
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
+
+async def _bundle(project_dir: str, work_dir: str, options: list[str]) -> list[str]:
+    """
+    Bundle the project once so parallel render processes don't each run
+    webpack. Returns the serve-URL argument for the CLI (empty on failure,
+    meaning each process bundles for itself).
+    """
+    bundle_dir = os.path.join(work_dir, "bundle")
+    returncode = await _run_logged(
+        ["npx", "remotion", "bundle", f"--out-dir={bundle_dir}", *options], cwd=project_dir,
+    )
+    return [bundle_dir] if returncode == 0 else []
+
+
+async def _render_ranges(
+    project_dir: str,
+    serve: list[str],
+    options: list[str],
+    ranges: list[tuple[str, int, int, str]],
+    work_dir: str,
+) -> str | None:
+    """
+    Render (path, first, last, label) frame ranges as muted h264, plus the
+    whole audio track as AAC, all in parallel. Returns the audio path, or
+    None if the audio render failed.
+    """
+    tab_concurrency = max(1, (os.cpu_count() or 1) // max(1, len(ranges)))
+    audio_path = os.path.join(work_dir, "audio.aac")
+    renders = [
+        _run_logged(
+            ["npx", "remotion", "render", *serve, COMPOSITION_ID, path, *options,
+             f"--frames={first}-{last}", "--muted", "--codec=h264",
+             f"--concurrency={tab_concurrency}"],
+            cwd=project_dir, prefix=f"[{label}] ",
+        )
+        for path, first, last, label in ranges
+    ]
+    renders.append(_run_logged(
+        ["npx", "remotion", "render", *serve, COMPOSITION_ID, audio_path, *options, "--codec=aac"],
+        cwd=project_dir, prefix="[audio] ",
+    ))
+    *range_codes, audio_code = await asyncio.gather(*renders)
+
+    failed = [label for (_, _, _, label), code in zip(ranges, range_codes) if code != 0]
+    if failed:
+        raise RuntimeError(f"{', '.join(failed)} failed")
+    if audio_code == 0 and os.path.exists(audio_path):
+        return audio_path
+    print("Warning: audio track render failed, output will be silent")
+    return None
+
+
+async def _concat(paths: list[str], audio_path: str | None, output_path: str, project_dir: str, work_dir: str):
+    """Join video segments and mux the audio track, without re-encoding."""
+    list_path = os.path.join(work_dir, "concat.txt")
+    with open(list_path, "w") as f:
+        f.writelines(f"file '{path}'\n" for path in paths)
+
+    concat_cmd = [*_ffmpeg(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        concat_cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-bsf:a", "aac_adtstoasc"]
+    concat_cmd += ["-c", "copy", "-movflags", "+faststart", output_path]
+    returncode = await _run_logged(concat_cmd, cwd=project_dir, prefix="[concat] ")
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed with exit code {returncode}")
+
+
+async def _composition_frames(project_dir: str, serve: list[str], options: list[str]) -> int | None:
+    """Total frames of the composition, from `npx remotion compositions`."""
     proc = await asyncio.create_subprocess_exec(
-        *render_cmd,
+        "npx", "remotion", "compositions", *serve, *options,
         cwd=project_dir,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.STDOUT,
     )
+    stdout, _ = await proc.communicate()
+    # e.g. "PromoVideo    30    1920x1080    600 (20.00 sec)"
+    match = re.search(
+        rf"^{COMPOSITION_ID}\s+[\d.]+\s+\d+x\d+\s+(\d+)",
+        stdout.decode(errors="replace"),
+        re.MULTILINE,
+    )
+    if proc.returncode != 0 or not match:
+        print("Warning: could not determine composition length")
+        return None
+    return int(match.group(1))
 
-    while True:
-        line = await proc.stdout.readline()
-        if not line:
-            break
-        print(line.decode(), end="")
 
-    await proc.wait()
-    print("-" * 60)
+def _frame_ranges(total_frames: int, workers: int, min_frames: int) -> list[tuple[int, int]]:
+    """Split [0, total_frames) into up to `workers` inclusive ranges of >= min_frames."""
+    count = max(1, min(workers, total_frames // max(1, min_frames)))
+    size = math.ceil(total_frames / count)
+    return [(start, min(start + size, total_frames) - 1) for start in range(0, total_frames, size)]
 
-    if proc.returncode != 0:
-        raise RuntimeError(f"Remotion render failed with exit code {proc.returncode}")
 
-    print("Render finished.")
+def _ffmpeg() -> list[str]:
+    """System ffmpeg, or the one bundled with Remotion."""
+    path = shutil.which("ffmpeg")
+    return [path] if path else ["npx", "remotion", "ffmpeg"]
 
-    os.makedirs("outputs", exist_ok=True)
-    local_video_path = os.path.abspath(f"outputs/{output_name}")
-    shutil.copy(remote_output, local_video_path)
 
-    size = os.path.getsize(local_video_path)
-    print(f"Output: {local_video_path} ({size / 1024 / 1024:.2f} MB)")
-    return local_video_path
+async def _run_logged(cmd: list[str], cwd: str, prefix: str = "") -> int:
+    """Run a command, echoing its output line by line. Returns the exit code."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    while True:
+        line = await proc.stdout.readline()
+        if not line:
+            break
+        print(prefix + line.decode(errors="replace"), end="")
+    return await proc.wait()
 
 
 # ---------------------------------------------------------------------------
@@ -156,13 +439,14 @@ async def _render_agentic(
     url: str | None = None,
     scraped_data: dict | None = None,
     storyboard=None,
+    on_progress=None,
 ) -> str:
     """
     Multi-agent agentic render. Takes a storyboard designed by the Creative Director
     agent and hands it to Cline to implement as a Remotion video from scratch.
 
-    Creates a temporary copy of the Remotion project so the original template
-    stays untouched for future templated renders.
+    Works in a private copy of the Remotion project (see workdirs.py) so the
+    original template stays untouched for future templated renders.
     """
     source_dir = REMOTION_PROJECT_DIR
     if not os.path.isdir(source_dir):
@@ -173,83 +457,112 @@ async def _render_agentic(
 
     output_name = _output_name_from_props(local_props_path)
 
-    # --- 1. Create a fresh working copy (symlink node_modules to save space) ---
-    # Use a directory under home to avoid shell spawn issues in deep /var/folders paths
-    job_id = os.path.basename(local_props_path).replace("temp_props_", "").replace(".json", "")
-    agentic_base = os.path.expanduser("~/.remotion-agentic")
-    os.makedirs(agentic_base, exist_ok=True)
-    work_dir = os.path.join(agentic_base, f"work-{job_id}")
-    if os.path.exists(work_dir):
-        shutil.rmtree(work_dir)
-
-    print(f"[agentic] Creating working copy at {work_dir}...")
-    # Copy everything except node_modules and out/
-    shutil.copytree(
-        source_dir,
-        work_dir,
-        ignore=shutil.ignore_patterns("node_modules", "out", ".git"),
-    )
-    # Symlink node_modules from the original so we don't re-install
-    os.symlink(
-        os.path.join(source_dir, "node_modules"),
-        os.path.join(work_dir, "node_modules"),
-    )
-    os.makedirs(os.path.join(work_dir, "out"), exist_ok=True)
-
-    # Ensure .cline and .agents directories are present (for Remotion skills)
-    # They may already be copied by copytree; if not, copy them now
-    for skills_dir in [".cline", ".agents"]:
-        src_skills = os.path.join(source_dir, skills_dir)
-        dst_skills = os.path.join(work_dir, skills_dir)
-        if os.path.isdir(src_skills) and not os.path.isdir(dst_skills):
-            shutil.copytree(src_skills, dst_skills)
-
+    # --- 1. Take a working copy (pre-warmed when one is ready) ---
+    job_id = _job_id_from_props(local_props_path)
+    work_dir = await asyncio.to_thread(workdirs.acquire, source_dir, job_id)
     print(f"[agentic] Working copy ready.")
 
-    # --- 2. Ensure we have a storyboard ---
-    if storyboard is None:
-        # Fallback: run the multi-agent pipeline inline
-        if scraped_data is None and url:
-            from src.agents.scraper import scrape_url
-            print(f"[agentic] Scraping {url}...")
-            scraped_data = scrape_url(url)
-
-        if not scraped_data:
-            raise ValueError("Agentic mode requires a URL, scraped data, or storyboard.")
-
-        from src.agents.agents import Agents
-        print("[agentic] Running Analyst agent...")
-        analysis = Agents.analyze(scraped_data)
-        print(f"[agentic] Analysis: {analysis.hook[:80]}")
-
-        raw = scraped_data.get("raw_browse_data", {})
-        print("[agentic] Running Creative Director agent...")
-        storyboard = Agents.storyboard(
-            product_name=scraped_data.get("title", "Product"),
-            analysis=analysis,
-            available_images=scraped_data.get("gallery", []),
-            website_description=scraped_data.get("description", ""),
-            features=raw.get("features", []),
-        )
-        print(f"[agentic] Storyboard ready: {len(storyboard.scenes)} scenes")
+    try:
+        # --- 2. Ensure we have a storyboard ---
+        if storyboard is None:
+            # Fallback: run the multi-agent pipeline inline
+            if scraped_data is None and url:
+                from src.agents.scraper import scrape_url
+                print(f"[agentic] Scraping {url}...")
+                scraped_data = await asyncio.to_thread(scrape_url, url)
+
+            if not scraped_data:
+                raise ValueError("Agentic mode requires a URL, scraped data, or storyboard.")
+
+            from src.agents.agents import Agents
+            print("[agentic] Running Analyst agent...")
+            analysis = await asyncio.to_thread(Agents.analyze, scraped_data)
+            print(f"[agentic] Analysis: {analysis.hook[:80]}")
+
+            raw = scraped_data.get("raw_browse_data", {})
+            print("[agentic] Running Creative Director agent...")
+            storyboard = await asyncio.to_thread(
+                Agents.storyboard,
+                product_name=scraped_data.get("title", "Product"),
+                analysis=analysis,
+                available_images=scraped_data.get("gallery", []),
+                website_description=scraped_data.get("description", ""),
+                features=raw.get("features", []),
+            )
+            print(f"[agentic] Storyboard ready: {len(storyboard.scenes)} scenes")
+
+        # --- 3. Generate audio (voiceovers + background music) ---
+        public_dir = os.path.join(work_dir, "public")
+        os.makedirs(public_dir, exist_ok=True)
+
+        audio_metadata = []
+        background_music_file = None
+        try:
+            audio_metadata = await asyncio.to_thread(generate_scene_voiceovers, storyboard, public_dir)
+            sb_dict = storyboard.model_dump() if hasattr(storyboard, "model_dump") else storyboard
+            music_style = sb_dict.get("background_music_style", "upbeat")
+            background_music_file = await asyncio.to_thread(prepare_background_music, music_style, public_dir)
+        except Exception as e:
+            print(f"[agentic] Warning: Audio generation failed, continuing without audio: {e}")
+
+        # Stretch scenes that are shorter than their measured voiceover
+        storyboard = _fit_scenes_to_audio(storyboard, audio_metadata)
+
+        # Storyboard images, fetched up front under content-hashed names
+        image_files = await asyncio.to_thread(upload_assets, work_dir, storyboard.get("image_urls", []), True)
+        # Cached code can only be reused when every image has a known filename
+        use_code_cache = code_cache.CLINE_CODE_CACHE and all(image_files)
+
+        # --- 4. Reuse code Cline wrote for an equivalent storyboard, else run Cline ---
+        remote_output = None
+        cached_files = code_cache.lookup(storyboard, image_files) if use_code_cache else None
+        if cached_files:
+            remote_output = await _render_cached_code(
+                source_dir, work_dir, output_name, cached_files, storyboard, audio_metadata,
+                on_progress=on_progress,
+            )
+        if remote_output is None:
+            remote_output = await _run_cline(
+                work_dir, output_name, storyboard, audio_metadata, background_music_file, image_files,
+                on_progress=on_progress,
+            )
+            if use_code_cache:
+                await asyncio.to_thread(code_cache.store, work_dir, storyboard, image_files)
+
+        local_video_path = await asyncio.to_thread(_publish_output, remote_output, output_name)
+
+        size = os.path.getsize(local_video_path)
+        print(f"Output: {local_video_path} ({size / 1024 / 1024:.2f} MB)")
+    finally:
+        # --- 5. Cleanup working copy (deleted in the background), also on failure ---
+        try:
+            workdirs.release(work_dir)
+            print(f"[agentic] Released working copy.")
+        except Exception as e:
+            print(f"[agentic] Warning: could not clean up {work_dir}: {e}")
 
-    # --- 3. Generate audio (voiceovers + background music) ---
-    public_dir = os.path.join(work_dir, "public")
-    os.makedirs(public_dir, exist_ok=True)
+    return local_video_path
 
-    audio_metadata = []
-    background_music_file = None
-    try:
-        audio_metadata = generate_scene_voiceovers(storyboard, public_dir)
-        sb_dict = storyboard.model_dump() if hasattr(storyboard, "model_dump") else storyboard
-        music_style = sb_dict.get("background_music_style", "upbeat")
-        background_music_file = prepare_background_music(music_style, public_dir)
-    except Exception as e:
-        print(f"[agentic] Warning: Audio generation failed, continuing without audio: {e}")
 
-    # --- 4. Build the implementation brief from the storyboard ---
+async def _run_cline(
+    work_dir: str,
+    output_name: str,
+    storyboard: dict,
+    audio_metadata: list[dict],
+    background_music_file: str | None,
+    image_files: list[str | None],
+    on_progress=None,
+) -> str:
+    """Have Cline implement the storyboard in work_dir. Returns the rendered video path."""
+    # Build the implementation brief from the storyboard
     brief_path = os.path.join(work_dir, "TASK_BRIEF.md")
-    brief = _build_agentic_brief(storyboard, output_name, audio_metadata=audio_metadata, background_music_file=background_music_file)
+    brief = _build_agentic_brief(
+        storyboard, output_name,
+        audio_metadata=audio_metadata,
+        background_music_file=background_music_file,
+        incremental=segments.RENDER_INCREMENTAL,
+        image_files=image_files,
+    )
     with open(brief_path, "w") as f:
         f.write(brief)
 
@@ -263,7 +576,7 @@ async def _render_agentic(
 
     cline_cmd = [
         "cline", "-y",
-        "--timeout", "900",
+        "--timeout", str(CLINE_TIMEOUT_SECONDS),
         task_prompt,
     ]
 
@@ -272,64 +585,120 @@ async def _render_agentic(
     print(f"[agentic] Working directory: {work_dir}")
     print("-" * 60)
 
-    proc = await asyncio.create_subprocess_exec(
-        *cline_cmd,
-        cwd=work_dir,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.STDOUT,
+    remote_output = os.path.join(work_dir, "out", output_name)
+    supervisor = ClineSupervisor(
+        cline_cmd, work_dir, remote_output,
+        expected_scenes=len(storyboard.get("scenes", [])),
+        # Incremental: the backend renders after Cline is done
+        wait_for_output=not segments.RENDER_INCREMENTAL,
+        on_progress=on_progress,
     )
+    video_path = await supervisor.run()
+    print("-" * 60)
 
-    while True:
-        line = await proc.stdout.readline()
-        if not line:
-            break
-        print(line.decode(), end="")
+    if segments.RENDER_INCREMENTAL:
+        if on_progress:
+            on_progress("rendering", "Rendering scenes...")
+        await _render_incremental(work_dir, remote_output, storyboard, audio_metadata)
+    elif video_path is None:
+        raise FileNotFoundError(f"Cline produced no complete .mp4 in {os.path.dirname(remote_output)}")
+    else:
+        remote_output = video_path
+        print(f"[agentic] Found output: {remote_output}")
 
-    await proc.wait()
-    print("-" * 60)
+    return remote_output
 
-    if proc.returncode != 0:
-        print(f"Warning: Cline exited with code {proc.returncode}")
 
-    # --- 4. Find the output video ---
+async def _render_cached_code(
+    source_dir: str,
+    work_dir: str,
+    output_name: str,
+    files: dict[str, str],
+    storyboard: dict,
+    audio_metadata: list[dict],
+    on_progress=None,
+) -> str | None:
+    """
+    Render parameterized code from the code cache (see code_cache.py).
+    Returns the video path, or None after restoring the template's src/
+    if the code doesn't render.
+    """
+    print("[code-cache] Near-match found, rendering cached code without Cline")
+    if on_progress:
+        on_progress("rendering", "Reusing code from an equivalent storyboard...")
+    src_dir = os.path.join(work_dir, "src")
     remote_output = os.path.join(work_dir, "out", output_name)
-    if not os.path.exists(remote_output):
-        out_dir = os.path.join(work_dir, "out")
-        if os.path.isdir(out_dir):
-            mp4s = [f for f in os.listdir(out_dir) if f.endswith(".mp4")]
-            if mp4s:
-                mp4s.sort(
-                    key=lambda f: os.path.getmtime(os.path.join(out_dir, f)),
-                    reverse=True,
-                )
-                remote_output = os.path.join(out_dir, mp4s[0])
-                print(f"[agentic] Found output: {remote_output}")
-            else:
-                raise FileNotFoundError(f"No .mp4 files found in {out_dir}")
+    await asyncio.to_thread(code_cache.write_tree, src_dir, files)
+    try:
+        if segments.RENDER_INCREMENTAL:
+            await _render_incremental(work_dir, remote_output, storyboard, audio_metadata)
         else:
-            raise FileNotFoundError(f"Output directory not found: {out_dir}")
-
-    os.makedirs("outputs", exist_ok=True)
-    local_video_path = os.path.abspath(f"outputs/{output_name}")
-    shutil.copy(remote_output, local_video_path)
+            await _render_composition(work_dir, remote_output, use_server=False)
+        return remote_output
+    except Exception as e:
+        print(f"[code-cache] Cached code failed to render ({e}), falling back to Cline")
+        await asyncio.to_thread(shutil.rmtree, src_dir, True)
+        await asyncio.to_thread(shutil.copytree, os.path.join(source_dir, "src"), src_dir)
+        return None
 
-    size = os.path.getsize(local_video_path)
-    print(f"Output: {local_video_path} ({size / 1024 / 1024:.2f} MB)")
 
-    # --- 5. Cleanup working copy ---
+async def _render_incremental(work_dir: str, output_path: str, storyboard: dict, audio_metadata: list[dict]):
+    """Render Cline's project scene by scene, or in one piece if it can't be split."""
     try:
-        shutil.rmtree(work_dir)
-        print(f"[agentic] Cleaned up working copy.")
+        plan = await asyncio.to_thread(segments.plan_segments, work_dir, storyboard, audio_metadata)
+        if plan and await _render_segmented(work_dir, output_path, plan):
+            return
     except Exception as e:
-        print(f"[agentic] Warning: could not clean up {work_dir}: {e}")
-
-    return local_video_path
+        print(f"[segments] Warning: incremental render failed ({e}), rendering in one piece")
+    await _render_composition(work_dir, output_path, use_server=False)
 
 
-def _build_agentic_brief(storyboard, output_name: str, audio_metadata: list[dict] | None = None, background_music_file: str | None = None) -> str:
+def _fit_scenes_to_audio(storyboard, audio_metadata: list[dict]) -> dict:
+    """
+    Return a storyboard dict where every scene lasts at least its voiceover
+    plus VOICEOVER_TAIL_SECONDS (rounded up to half a second), with the total
+    duration recomputed if any scene was stretched.
+    """
+    if hasattr(storyboard, "model_dump"):
+        sb = storyboard.model_dump()
+    else:
+        sb = json.loads(json.dumps(storyboard))
+
+    durations = {am["scene_number"]: am.get("duration_seconds", am["duration_estimate"]) for am in audio_metadata}
+    stretched = False
+    for scene in sb.get("scenes", []):
+        voiceover = durations.get(scene.get("scene_number"))
+        if voiceover is None:
+            continue
+        needed = math.ceil((voiceover + VOICEOVER_TAIL_SECONDS) * 2) / 2
+        if scene.get("duration_seconds", 0) < needed:
+            print(f"[agentic] Scene {scene.get('scene_number')}: {scene.get('duration_seconds')}s -> {needed}s to fit voiceover")
+            scene["duration_seconds"] = needed
+            stretched = True
+
+    if stretched:
+        sb["total_duration_seconds"] = sum(s.get("duration_seconds", 0) for s in sb.get("scenes", []))
+    return sb
+
+
+def _build_agentic_brief(
+    storyboard,
+    output_name: str,
+    audio_metadata: list[dict] | None = None,
+    background_music_file: str | None = None,
+    incremental: bool = False,
+    image_files: list[str | None] | None = None,
+) -> str:
     """
     Build an implementation brief for Cline from a VideoStoryboard object
     designed by the Creative Director agent.
+
+    image_files holds the public/ filename of each image URL already
+    downloaded (None where the download failed); Cline fetches the rest.
+
+    With incremental=True, Cline only checks its code and the backend renders
+    the video scene by scene, so scenes must map one-to-one onto files and
+    sequences (see segments.py).
     """
     # Handle both pydantic model and dict
     if hasattr(storyboard, "model_dump"):
@@ -347,6 +716,22 @@ def _build_agentic_brief(storyboard, output_name: str, audio_metadata: list[dict
 
     total_frames = int(total_dur * 30)
 
+    if incremental:
+        structure_steps = f"""2. **Create one `.tsx` component per scene** in `src/scenes/`, named after the scene
+   (e.g. scene "Hero" -> `src/scenes/Hero.tsx`)
+3. **Create `src/PromoVideo.tsx`** that composes all scenes using `<Series>` (not `<TransitionSeries>`),
+   one `<Series.Sequence>` per scene with exactly the frame count listed above"""
+        render_steps = f"""6. **Check**: `npx remotion compositions` must list `PromoVideo` with {total_frames} frames
+7. **Spot-check**: render one still per scene, e.g. `npx remotion still PromoVideo out/check.png --frame=N`.
+   Do NOT render the full video — the backend renders it scene by scene after you finish"""
+        output_section = f"The backend renders `out/{output_name}` from your code once you are done."
+    else:
+        structure_steps = """2. **Create one `.tsx` component per scene** in `src/scenes/`
+3. **Create `src/PromoVideo.tsx`** that composes all scenes using `<Series>` or `<TransitionSeries>`"""
+        render_steps = f"""6. **Render**: `npx remotion render PromoVideo out/{output_name} --concurrency={RENDER_CHUNK_WORKERS}`
+7. **Verify**: Confirm `out/{output_name}` exists and is non-empty"""
+        output_section = f"Final video MUST be at: `out/{output_name}`"
+
     # Format color palette
     color_list = "\n".join(f"  - `{c}`" for c in colors)
 
@@ -371,15 +756,24 @@ def _build_agentic_brief(storyboard, output_name: str, audio_metadata: list[dict
 """
         if scene_num in audio_by_scene:
             am = audio_by_scene[scene_num]
-            scenes_section += f"""- **Voiceover audio**: `{am['filename']}` (script: "{am['script']}", ~{am['duration_estimate']}s)
+            scenes_section += f"""- **Voiceover audio**: `{am['filename']}` (script: "{am['script']}", {am.get('duration_seconds', am['duration_estimate'])}s)
 """
 
     # Format image URLs
     images_section = ""
     if image_urls:
-        images_section = "## Images to Download\nDownload these to `public/` and use via `staticFile()`:\n"
-        for img in image_urls:
-            images_section += f"- {img}\n"
+        image_files = image_files or [None] * len(image_urls)
+        downloaded = [(img, f) for img, f in zip(image_urls, image_files) if f]
+        missing = [img for img, f in zip(image_urls, image_files) if not f]
+        images_section = "## Images\n"
+        if downloaded:
+            images_section += "Already downloaded to `public/` — use these filenames via `staticFile()`:\n"
+            for img, f in downloaded:
+                images_section += f"- `{f}` (from {img})\n"
+        if missing:
+            images_section += "Download these to `public/` and use via `staticFile()`:\n"
+            for img in missing:
+                images_section += f"- {img}\n"
 
     # Format audio section
     audio_section = ""
@@ -428,15 +822,13 @@ animation notes closely.
 ### Steps
 
 1. **Delete ALL existing files** in `src/scenes/` — start completely fresh
-2. **Create one `.tsx` component per scene** in `src/scenes/`
-3. **Create `src/PromoVideo.tsx`** that composes all scenes using `<Series>` or `<TransitionSeries>`
+{structure_steps}
 4. **Update `src/Root.tsx`** to register the composition:
    - id: `"PromoVideo"`
    - Width: 1920, Height: 1080, FPS: 30
    - Duration: {total_frames} frames
-5. **Download any images** listed above to `public/` using curl
-6. **Render**: `npx remotion render PromoVideo out/{output_name} --concurrency=1`
-7. **Verify**: Confirm `out/{output_name}` exists and is non-empty
+5. **Download any images** still listed above as not yet downloaded to `public/` using curl
+{render_steps}
 
 ### Audio Integration
 - Import `{{Audio, staticFile}}` from `remotion`
@@ -445,10 +837,10 @@ animation notes closely.
 - For background music, add at the root composition level (in `PromoVideo.tsx`):
   `<Audio src={{staticFile("background_music.mp3")}} loop volume={{0.15}} />`
 - Audio files are already in `public/` — do NOT download them
-- **IMPORTANT: Scene timing must accommodate voiceover duration.** Each scene's
-  `<Series.Sequence>` duration MUST be at least the voiceover duration + 1 second of buffer.
-  If a voiceover is ~3s, the scene should be at least 4s (120 frames). Voiceovers that get
-  cut off by a scene transition sound broken — always leave breathing room at the end.
+- **IMPORTANT: Scene timing already fits the voiceovers.** Voiceover lengths above are
+  measured from the audio files, and every scene's duration includes at least 1 second of
+  breathing room after its voiceover. Use each scene's listed frame count for its
+  `<Series.Sequence>` exactly — do NOT shorten scenes, or voiceovers get cut off.
 
 ### Animation Toolkit (use these!)
 - `spring({{ frame, fps, config: {{ damping: 15, stiffness: 100 }} }})` — organic entrances
@@ -466,15 +858,23 @@ animation notes closely.
 ### What NOT to do
 - Do NOT keep any existing template code — delete `src/scenes/*`, `src/types.ts`, `src/SignalPromo.tsx`
 - Do NOT install new npm packages
-- Do NOT use placeholder text — use the exact text from the storyboard
+- Do NOT use placeholder text — use the exact text from the storyboard, as string literals written out in full
+  (not split, templated or assembled from parts)
 - Do NOT make it generic — follow the creative concept precisely
 
 ### Output
-Final video MUST be at: `out/{output_name}`
+{output_section}
 """
 
 
 if __name__ == "__main__":
     props_arg = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PROPS_FILE
     url_arg = sys.argv[2] if len(sys.argv) > 2 else None
-    asyncio.run(render_video(props_arg, url=url_arg))
+
+    async def main():
+        try:
+            await render_video(props_arg, url=url_arg)
+        finally:
+            await render_server.shutdown()
+
+    asyncio.run(main())
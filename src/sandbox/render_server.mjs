@@ -0,0 +1,206 @@
+/**
+ * render_server.mjs - Long-lived Remotion render sidecar.
+ *
+ * Bundles the Remotion project once per source hash, keeps one headless
+ * browser open, and renders compositions on request, so templated renders
+ * skip npx resolution, webpack and browser startup.
+ *
+ * Speaks newline-delimited JSON over a unix socket. Requests on one
+ * connection are handled in order:
+ *   {"type": "bundle", "key": "<source hash>"}
+ *       -> {"ok": true, "serveUrl": "<bundle dir>"}
+ *   {"type": "render", "key", "composition", "propsPath", "output", "concurrency"}
+ *       -> {"progress": 0.42} ... then {"ok": true}
+ * Failures reply {"ok": false, "error": "..."}.
+ *
+ * Remotion packages are resolved from the project's node_modules. Started by
+ * src/sandbox/render_server.py:
+ *   node render_server.mjs --project=DIR --socket=PATH --bundle-root=DIR
+ */
+
+import fs from "node:fs";
+import net from "node:net";
+import path from "node:path";
+import { createRequire } from "node:module";
+
+const args = Object.fromEntries(
+  process.argv.slice(2).map((arg) => {
+    const [key, ...value] = arg.replace(/^--/, "").split("=");
+    return [key, value.join("=")];
+  }),
+);
+const projectDir = path.resolve(args.project);
+const socketPath = args.socket;
+const bundleRoot = args["bundle-root"];
+
+const require = createRequire(path.join(projectDir, "package.json"));
+const { bundle } = require("@remotion/bundler");
+const { openBrowser, selectComposition, renderMedia } = require("@remotion/renderer");
+
+const log = (message) => console.log(`[render-server] ${message}`);
+
+// source hash -> Promise<serveUrl>
+const bundles = new Map();
+let browser = null;
+
+function getBrowser() {
+  if (!browser) {
+    browser = openBrowser("chrome");
+    browser.catch(() => {
+      browser = null;
+    });
+  }
+  return browser;
+}
+
+function entryPoint() {
+  for (const name of ["src/index.ts", "src/index.tsx", "src/index.js", "src/index.jsx"]) {
+    const candidate = path.join(projectDir, name);
+    if (fs.existsSync(candidate)) return candidate;
+  }
+  throw new Error(`No Remotion entry point found in ${projectDir}/src`);
+}
+
+function getBundle(key) {
+  if (!bundles.has(key)) {
+    const outDir = path.join(bundleRoot, key);
+    const pending = (async () => {
+      if (!fs.existsSync(path.join(outDir, "index.html"))) {
+        log(`Bundling ${projectDir} (${key.slice(0, 12)})...`);
+        const started = Date.now();
+        await bundle({
+          entryPoint: entryPoint(),
+          outDir,
+          publicDir: path.join(projectDir, "public"),
+        });
+        log(`Bundled in ${((Date.now() - started) / 1000).toFixed(1)}s`);
+      }
+      pruneBundles(key);
+      return outDir;
+    })();
+    pending.catch(() => bundles.delete(key));
+    bundles.set(key, pending);
+  }
+  return bundles.get(key);
+}
+
+function pruneBundles(currentKey) {
+  // Bundles of older template sources are never used again
+  for (const name of fs.readdirSync(bundleRoot)) {
+    if (name === currentKey) continue;
+    bundles.delete(name);
+    fs.rmSync(path.join(bundleRoot, name), { recursive: true, force: true });
+  }
+}
+
+async function render(request, send) {
+  const serveUrl = await getBundle(request.key);
+  const inputProps = JSON.parse(fs.readFileSync(request.propsPath, "utf8"));
+  const puppeteerInstance = await getBrowser();
+
+  try {
+    const composition = await selectComposition({
+      serveUrl,
+      id: request.composition,
+      inputProps,
+      puppeteerInstance,
+    });
+    let reported = -1;
+    await renderMedia({
+      composition,
+      serveUrl,
+      codec: "h264",
+      outputLocation: request.output,
+      inputProps,
+      puppeteerInstance,
+      concurrency: request.concurrency || null,
+      onProgress: ({ progress }) => {
+        const percent = Math.floor(progress * 100);
+        if (percent !== reported) {
+          reported = percent;
+          send({ progress });
+        }
+      },
+    });
+  } catch (err) {
+    // A crashed browser is reopened for the next render
+    if (/closed|disconnected|crash/i.test(String(err))) {
+      browser = null;
+      Promise.resolve(puppeteerInstance.close?.(true)).catch(() => {});
+    }
+    throw err;
+  }
+}
+
+async function handle(line, send) {
+  try {
+    const request = JSON.parse(line);
+    if (request.type === "bundle") {
+      send({ ok: true, serveUrl: await getBundle(request.key) });
+    } else if (request.type === "render") {
+      await render(request, send);
+      send({ ok: true });
+    } else {
+      throw new Error(`Unknown request type: ${request.type}`);
+    }
+  } catch (err) {
+    send({ ok: false, error: String(err?.stack || err) });
+  }
+}
+
+const server = net.createServer((socket) => {
+  const send = (message) => {
+    if (!socket.destroyed) socket.write(JSON.stringify(message) + "\n");
+  };
+  let buffer = "";
+  let queue = Promise.resolve();
+  socket.setEncoding("utf8");
+  socket.on("data", (chunk) => {
+    buffer += chunk;
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      if (line.trim()) queue = queue.then(() => handle(line, send));
+    }
+  });
+  socket.on("error", () => {});
+});
+
+async function socketInUse() {
+  return new Promise((resolve) => {
+    const probe = net.connect(socketPath, () => {
+      probe.end();
+      resolve(true);
+    });
+    probe.on("error", () => resolve(false));
+  });
+}
+
+async function shutdown() {
+  server.close();
+  fs.rmSync(socketPath, { force: true });
+  const open = browser && (await browser.catch(() => null));
+  await Promise.resolve(open?.close?.(true)).catch(() => {});
+  process.exit(0);
+}
+
+if (fs.existsSync(socketPath)) {
+  if (await socketInUse()) {
+    // Another API worker already started a server
+    log(`Already running on ${socketPath}`);
+    process.exit(0);
+  }
+  fs.rmSync(socketPath, { force: true });
+}
+fs.mkdirSync(path.dirname(socketPath), { recursive: true });
+fs.mkdirSync(bundleRoot, { recursive: true });
+
+process.on("SIGTERM", shutdown);
+process.on("SIGINT", shutdown);
+
+server.listen(socketPath, () => {
+  log(`Listening on ${socketPath}`);
+  // Warm the browser before the first request arrives
+  getBrowser().catch((err) => log(`Could not open browser: ${err}`));
+});
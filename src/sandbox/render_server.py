@@ -0,0 +1,248 @@
+"""
+render_server.py - Client for the warm Remotion render sidecar (render_server.mjs).
+
+The sidecar bundles the template once per source hash and keeps a headless
+browser open between renders. It is started on first use and found again by
+its unix socket, so several API workers share one sidecar. A job's assets
+are hardlinked into the bundle's public/ before its render; asset names are
+content hashes, so jobs never collide there. Each render holds a shared
+flock on the asset names it uses and unlinks those nobody else holds once it
+finishes, so the bundle doesn't grow with every job's assets.
+
+If Node or the Remotion packages are unavailable, render() raises
+RenderServerError and the caller falls back to `npx remotion render`.
+"""
+
+import os
+import json
+import fcntl
+import time
+import asyncio
+import shutil
+import hashlib
+
+from src.cache import CACHE_ROOT
+
+RENDER_SERVER = os.environ.get("RENDER_SERVER", "1") == "1"
+RENDER_SERVER_SOCKET = os.path.expanduser(
+    os.environ.get("RENDER_SERVER_SOCKET", os.path.join(CACHE_ROOT, "render-server.sock"))
+)
+RENDER_SERVER_START_TIMEOUT_SECONDS = 30
+BUNDLE_ROOT = os.path.join(CACHE_ROOT, "remotion-bundles")
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render_server.mjs")
+# Template files that don't affect the bundle
+_IGNORED_DIRS = {"node_modules", "out", "build", ".git"}
+# Responses carry full stack traces
+_STREAM_LIMIT = 1024 * 1024
+
+_process = None
+_start_lock = asyncio.Lock()
+# path -> (size, mtime_ns, sha256) so unchanged files aren't re-read
+_file_digests: dict[str, tuple[int, int, str]] = {}
+
+
+class RenderServerError(RuntimeError):
+    pass
+
+
+def source_hash(project_dir: str) -> str:
+    """Hash of everything in the template that goes into the bundle."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(d for d in dirs if d not in _IGNORED_DIRS and not d.startswith("."))
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, project_dir).encode())
+            digest.update(_file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def _file_digest(path: str) -> str:
+    st = os.stat(path)
+    cached = _file_digests.get(path)
+    if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    file_digest = h.hexdigest()
+    _file_digests[path] = (st.st_size, st.st_mtime_ns, file_digest)
+    return file_digest
+
+
+async def render(
+    project_dir: str,
+    composition: str,
+    props_path: str,
+    output_path: str,
+    public_dir: str,
+    concurrency: int | None = None,
+):
+    """Render a composition of project_dir through the sidecar."""
+    key = await asyncio.to_thread(source_hash, project_dir)
+    reader, writer = await _connect(project_dir)
+    try:
+        serve_url = (await _request(reader, writer, {"type": "bundle", "key": key}))["serveUrl"]
+        held = await asyncio.to_thread(
+            _link_public, public_dir, os.path.join(serve_url, "public"), os.path.join(project_dir, "public"),
+        )
+        try:
+            started = time.monotonic()
+            await _request(reader, writer, {
+                "type": "render",
+                "key": key,
+                "composition": composition,
+                "propsPath": props_path,
+                "output": output_path,
+                "concurrency": concurrency,
+            })
+            print(f"[render-server] Rendered {composition} in {time.monotonic() - started:.1f}s")
+        finally:
+            await asyncio.to_thread(_release_public, held)
+    finally:
+        writer.close()
+
+
+async def shutdown():
+    """Stop the sidecar if this process started it."""
+    global _process
+    if _process is not None and _process.returncode is None:
+        _process.terminate()
+        try:
+            await asyncio.wait_for(_process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            _process.kill()
+    _process = None
+
+
+async def _request(reader, writer, message: dict) -> dict:
+    """Send one request and wait for its final reply, logging progress."""
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    last_logged = -1
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise RenderServerError("render server closed the connection")
+        reply = json.loads(line)
+        if "progress" in reply:
+            decile = int(reply["progress"] * 10)
+            if decile > last_logged:
+                last_logged = decile
+                print(f"[render-server] {message['type']} {reply['progress']:.0%}")
+            continue
+        if not reply.get("ok"):
+            raise RenderServerError(reply.get("error", "unknown error"))
+        return reply
+
+
+async def _connect(project_dir: str):
+    """Connect to the sidecar, starting it if nothing is listening."""
+    connection = await _try_connect()
+    if connection:
+        return connection
+
+    global _process
+    async with _start_lock:
+        connection = await _try_connect()
+        if connection:
+            return connection
+
+        if _process is None or _process.returncode is not None:
+            print("[render-server] Starting render server...")
+            try:
+                _process = await asyncio.create_subprocess_exec(
+                    "node", _SCRIPT,
+                    f"--project={project_dir}",
+                    f"--socket={RENDER_SERVER_SOCKET}",
+                    f"--bundle-root={BUNDLE_ROOT}",
+                )
+            except FileNotFoundError as e:
+                raise RenderServerError(f"node not found: {e}")
+
+        deadline = time.monotonic() + RENDER_SERVER_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            connection = await _try_connect()
+            if connection:
+                return connection
+            if _process.returncode not in (None, 0):
+                raise RenderServerError(f"render server exited with code {_process.returncode}")
+        raise RenderServerError("render server did not start in time")
+
+
+async def _try_connect():
+    try:
+        return await asyncio.open_unix_connection(RENDER_SERVER_SOCKET, limit=_STREAM_LIMIT)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+
+def _link_public(public_dir: str, bundle_public: str, template_public: str) -> list[tuple[int, str]]:
+    """
+    Hardlink a job's public/ files into the bundle's public/. Names the
+    template has are bundled with it and left alone. Every other name gets a
+    shared flock, held until _release_public, and is linked unless another
+    render already placed it (content-hashed, so identical).
+    Returns (fd, path) for each held name.
+    """
+    held = []
+    try:
+        for root, _, files in os.walk(public_dir):
+            rel_root = os.path.relpath(root, public_dir)
+            target = os.path.join(bundle_public, rel_root)
+            os.makedirs(target, exist_ok=True)
+            for name in files:
+                src, dest = os.path.join(root, name), os.path.join(target, name)
+                if os.path.exists(os.path.join(template_public, rel_root, name)):
+                    _link(src, dest)
+                else:
+                    held.append((_hold(src, dest), dest))
+    except BaseException:
+        _release_public(held)
+        raise
+    return held
+
+
+def _hold(src: str, dest: str) -> int:
+    """Link src to dest if needed and return an fd with a shared flock on it."""
+    while True:
+        _link(src, dest)
+        try:
+            fd = os.open(dest, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        # A finishing render may have unlinked the name while we waited for the lock
+        try:
+            if os.stat(dest).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def _release_public(held: list[tuple[int, str]]):
+    """Unlink held names no other render holds, and drop the locks."""
+    for fd, dest in held:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.stat(dest).st_ino == os.fstat(fd).st_ino:
+                os.unlink(dest)
+        except OSError:
+            # Held by another render (or already gone); the last one out removes it
+            pass
+        finally:
+            os.close(fd)
+
+
+def _link(src: str, dest: str):
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        pass
+    except OSError:
+        if not os.path.exists(dest):
+            shutil.copy2(src, dest)
@@ -0,0 +1,153 @@
+"""
+segments.py - Rendered-segment cache for scene-level incremental rendering.
+
+With RENDER_INCREMENTAL, an agentic video is rendered one scene at a time
+(see render._render_segmented) and each scene's video segment is cached
+under a key covering everything that can change its frames:
+
+  - the scene's storyboard entry and its frame range
+  - the code of the scene's component (src/scenes/<SceneName>.tsx)
+  - the public/ files that component references via staticFile()
+  - the scene's voiceover
+  - everything shared by all scenes: the rest of src/ and the files it
+    references, plus package.json and remotion.config.*
+
+Editing one scene's text therefore re-renders only that scene; the other
+segments come from the cache and are stitched back together losslessly.
+"""
+
+import os
+import re
+import hashlib
+
+from src.cache import DiskCache, cache_key
+
+RENDER_INCREMENTAL = os.environ.get("RENDER_INCREMENTAL", "0") == "1"
+SEGMENT_CACHE_MAX_BYTES = int(os.environ.get("SEGMENT_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+
+# Bump when the way segments are rendered changes
+SEGMENT_FORMAT_VERSION = 1
+
+_segments = DiskCache("segments", max_bytes=SEGMENT_CACHE_MAX_BYTES, suffix=".mp4")
+
+_SOURCE_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".json", ".css")
+_STATIC_FILE_RE = re.compile(r"""staticFile\(\s*[`'"]([^`'"]+)[`'"]\s*\)""")
+
+
+def plan_segments(work_dir: str, storyboard: dict, audio_metadata: list[dict], fps: int = 30) -> list[dict] | None:
+    """
+    One segment per storyboard scene: {scene_number, first, last, key}, with
+    inclusive frame ranges laid end to end. Returns None when the project
+    can't be split safely: scenes without their own component file, or
+    transitions that blend neighbouring scenes into each other's frames.
+    """
+    sources = _source_files(work_dir)
+    if any("TransitionSeries" in _read(path) for path in sources):
+        print("[segments] Project uses transitions between scenes, rendering in one piece")
+        return None
+
+    scene_dir = os.path.join(work_dir, "src", "scenes")
+    scene_files = {}
+    for scene in storyboard.get("scenes", []):
+        path = _scene_file(scene_dir, scene.get("scene_name", ""))
+        if path is None:
+            print(f"[segments] No component file for scene '{scene.get('scene_name')}', rendering in one piece")
+            return None
+        scene_files[scene.get("scene_number")] = path
+
+    public_dir = os.path.join(work_dir, "public")
+    shared = sorted(set(sources) - set(scene_files.values()))
+    shared += [
+        os.path.join(work_dir, name)
+        for name in sorted(os.listdir(work_dir))
+        if name == "package.json" or name.startswith("remotion.config.")
+    ]
+    shared_digest = cache_key(SEGMENT_FORMAT_VERSION, _files_digest(shared, work_dir, public_dir))
+
+    voiceovers = {am["scene_number"]: am.get("filename") for am in audio_metadata}
+    segments = []
+    first = 0
+    for scene in storyboard.get("scenes", []):
+        frames = int(scene.get("duration_seconds", 4) * fps)
+        number = scene.get("scene_number")
+        voiceover = voiceovers.get(number)
+        key = cache_key(
+            shared_digest,
+            scene,
+            first,
+            frames,
+            _files_digest([scene_files[number]], work_dir, public_dir),
+            _file_digest(os.path.join(public_dir, voiceover)) if voiceover else None,
+        )
+        segments.append({"scene_number": number, "first": first, "last": first + frames - 1, "key": key})
+        first += frames
+    return segments
+
+
+def lookup(key: str) -> str | None:
+    """Path of a cached segment, or None."""
+    return _segments.get_path(key)
+
+
+def store(key: str, path: str) -> str:
+    """Move a freshly rendered segment into the cache. Returns its cached path."""
+    return _segments.put_file(key, path, move=True)
+
+
+def stats() -> dict:
+    return _segments.stats()
+
+
+def _scene_file(scene_dir: str, scene_name: str) -> str | None:
+    """The component file named after a scene (Hero -> Hero.tsx, HeroScene.tsx, ...)."""
+    wanted = _normalize(scene_name)
+    if not wanted or not os.path.isdir(scene_dir):
+        return None
+    candidates = [
+        name for name in sorted(os.listdir(scene_dir))
+        if name.endswith(_SOURCE_EXTENSIONS)
+        and _normalize(os.path.splitext(name)[0]) in (wanted, wanted + "scene")
+    ]
+    return os.path.join(scene_dir, candidates[0]) if len(candidates) == 1 else None
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _source_files(work_dir: str) -> list[str]:
+    files = []
+    for root, dirs, names in os.walk(os.path.join(work_dir, "src")):
+        dirs.sort()
+        files += [os.path.join(root, name) for name in sorted(names) if name.endswith(_SOURCE_EXTENSIONS)]
+    return files
+
+
+def _files_digest(paths: list[str], work_dir: str, public_dir: str) -> str:
+    """Digest of source files plus the public/ files they reference."""
+    digest = hashlib.sha256()
+    assets = set()
+    for path in paths:
+        digest.update(os.path.relpath(path, work_dir).encode() + b"\0")
+        digest.update(_file_digest(path).encode())
+        assets.update(_STATIC_FILE_RE.findall(_read(path)))
+    for name in sorted(assets):
+        digest.update(name.encode() + b"\0")
+        digest.update(_file_digest(os.path.join(public_dir, name)).encode())
+    return digest.hexdigest()
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except (FileNotFoundError, IsADirectoryError):
+        return "missing"
+    return digest.hexdigest()
+
+
+def _read(path: str) -> str:
+    with open(path, "r", errors="replace") as f:
+        return f.read()
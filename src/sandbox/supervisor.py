@@ -0,0 +1,250 @@
+"""
+supervisor.py - Run Cline for an agentic render and watch it make progress.
+
+Cline's output is echoed and parsed, and its working directory is polled,
+for milestones reported through an on_progress(stage, detail) callback:
+  - scene components written to src/scenes/
+  - `npx remotion render` started, and its frame progress
+  - the output MP4 finalized
+
+Cline often keeps going after the video is done (re-checking, summarizing).
+Once the output is a complete MP4 whose size has stopped changing, Cline
+gets CLINE_EXIT_GRACE_SECONDS to exit on its own before it is stopped.
+Past CLINE_DEADLINE_SECONDS it is stopped regardless. Cline runs in its own
+process group, so stopping it also stops the renders and browsers it spawned.
+"""
+
+import os
+import re
+import time
+import signal
+import struct
+import asyncio
+
+# Passed to Cline's own --timeout
+CLINE_TIMEOUT_SECONDS = int(os.environ.get("CLINE_TIMEOUT_SECONDS", "900"))
+# Wall-clock limit enforced here, in case Cline doesn't honour its own
+CLINE_DEADLINE_SECONDS = int(os.environ.get("CLINE_DEADLINE_SECONDS", str(CLINE_TIMEOUT_SECONDS + 120)))
+# How long Cline may keep working after a complete video exists
+CLINE_EXIT_GRACE_SECONDS = float(os.environ.get("CLINE_EXIT_GRACE_SECONDS", "15"))
+
+_POLL_SECONDS = 1.0
+# Between SIGTERM and SIGKILL
+_KILL_GRACE_SECONDS = 5.0
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_RENDER_COMMAND_RE = re.compile(r"remotion\s+render\b")
+# Remotion CLI progress, e.g. "Rendered 120/600" or "Encoding ━━━━ 120/600"
+_FRAME_PROGRESS_RE = re.compile(r"\b(Render(?:ed|ing)|Encod(?:ed|ing)|Stitch(?:ed|ing))\b\D*?(\d+)\s*/\s*(\d+)")
+
+
+def is_complete_mp4(path: str) -> bool:
+    """
+    True when path holds a whole MP4: its top-level boxes tile the file
+    exactly and include ftyp, moov and mdat. A file still being written
+    either lacks moov or ends partway through a box.
+    """
+    try:
+        size = os.path.getsize(path)
+        seen = set()
+        offset = 0
+        with open(path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                box_size, box_type = struct.unpack(">I4s", header)
+                if box_size == 1:
+                    large = f.read(8)
+                    if len(large) < 8:
+                        return False
+                    box_size = struct.unpack(">Q", large)[0]
+                elif box_size == 0:
+                    box_size = size - offset
+                if box_size < 8:
+                    return False
+                seen.add(box_type)
+                offset += box_size
+    except OSError:
+        return False
+    return offset == size and {b"ftyp", b"moov", b"mdat"} <= seen
+
+
+class ClineSupervisor:
+    """
+    Runs one Cline process in work_dir. run() returns the path of a complete
+    output video (output_path, else the newest out/*.mp4), or None if Cline
+    produced none. With wait_for_output=False (incremental renders, where
+    the backend renders afterwards) Cline is left to finish on its own.
+    """
+
+    def __init__(
+        self,
+        cmd: list[str],
+        work_dir: str,
+        output_path: str,
+        expected_scenes: int = 0,
+        wait_for_output: bool = True,
+        on_progress=None,
+        deadline_seconds: float = CLINE_DEADLINE_SECONDS,
+    ):
+        self.cmd = cmd
+        self.work_dir = work_dir
+        self.output_path = output_path
+        self.expected_scenes = expected_scenes
+        self.wait_for_output = wait_for_output
+        self.on_progress = on_progress
+        self.deadline_seconds = deadline_seconds
+
+        self._started_at = 0.0
+        self._wall_started_at = 0.0
+        self._last_detail = None
+        self._scenes_written = 0
+        self._render_started = False
+        # Candidate output and its (size, mtime_ns) at the previous poll
+        self._candidate = None
+        self._completed_at = None
+        self.output = None
+
+    async def run(self) -> str | None:
+        self._started_at = time.monotonic()
+        self._wall_started_at = time.time()
+        proc = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            cwd=self.work_dir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True,
+        )
+        reader = asyncio.create_task(self._read_output(proc.stdout))
+        exited = asyncio.create_task(proc.wait())
+        timed_out = stopped = False
+        try:
+            while not exited.done():
+                await asyncio.wait({exited}, timeout=_POLL_SECONDS)
+                self._poll_work_dir()
+                elapsed = time.monotonic() - self._started_at
+                if exited.done():
+                    break
+                if elapsed > self.deadline_seconds:
+                    print(f"[supervisor] Cline passed its {self.deadline_seconds:.0f}s deadline, stopping it")
+                    timed_out = stopped = True
+                    break
+                if self._completed_at is not None and time.monotonic() - self._completed_at > CLINE_EXIT_GRACE_SECONDS:
+                    print(f"[supervisor] Video is complete, stopping Cline early after {elapsed:.0f}s")
+                    stopped = True
+                    break
+        finally:
+            # Also clears out renders and browsers left behind by a clean exit
+            await self._stop(proc, exited)
+            try:
+                await asyncio.wait_for(reader, timeout=_KILL_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                reader.cancel()
+
+        if proc.returncode != 0 and not stopped:
+            print(f"Warning: Cline exited with code {proc.returncode}")
+        self._poll_work_dir(final=True)
+        if timed_out and not self.output:
+            raise TimeoutError(f"Cline produced no video within {self.deadline_seconds:.0f}s")
+        return self.output
+
+    async def _read_output(self, stream: asyncio.StreamReader):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            text = line.decode(errors="replace")
+            print(text, end="")
+            self._parse_line(_ANSI_RE.sub("", text))
+
+    def _parse_line(self, line: str):
+        progress = _FRAME_PROGRESS_RE.search(line)
+        if progress:
+            verb, done, total = progress.groups()
+            label = "Encoding" if verb.startswith(("Encod", "Stitch")) else "Rendering"
+            self._report(label.lower(), f"{label} frames {done}/{total}")
+        elif not self._render_started and _RENDER_COMMAND_RE.search(line):
+            self._render_started = True
+            self._report("rendering", "Cline started the render...")
+
+    def _poll_work_dir(self, final: bool = False):
+        scene_dir = os.path.join(self.work_dir, "src", "scenes")
+        try:
+            # Template scenes predate the clone; only count what Cline wrote
+            written = sum(
+                1 for entry in os.scandir(scene_dir)
+                if entry.is_file() and entry.stat().st_mtime >= self._wall_started_at
+            )
+        except OSError:
+            written = 0
+        if written > self._scenes_written and not self._render_started:
+            self._scenes_written = written
+            total = f"/{self.expected_scenes}" if self.expected_scenes else ""
+            self._report("coding", f"Cline wrote {written}{total} scenes")
+
+        if not self.wait_for_output and not final:
+            return
+        path = self._find_output()
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        state = (path, st.st_size, st.st_mtime_ns) if st else None
+        if state != self._candidate:
+            # Still being written (or rewritten by a second render)
+            self._candidate = state
+            self.output = None
+            self._completed_at = None
+            if not final:
+                return
+        if state and self.output is None and is_complete_mp4(path):
+            self.output = path
+            self._completed_at = time.monotonic()
+            self._report("finalizing", f"Video written ({st.st_size / 1024 / 1024:.1f} MB), wrapping up...")
+
+    def _find_output(self) -> str | None:
+        if os.path.exists(self.output_path):
+            return self.output_path
+        out_dir = os.path.dirname(self.output_path)
+        try:
+            mp4s = [e for e in os.scandir(out_dir) if e.name.endswith(".mp4") and e.is_file()]
+        except OSError:
+            return None
+        if not mp4s:
+            return None
+        return max(mp4s, key=lambda e: e.stat().st_mtime).path
+
+    def _report(self, stage: str, detail: str):
+        if detail == self._last_detail:
+            return
+        self._last_detail = detail
+        if self.on_progress is not None:
+            self.on_progress(stage, detail)
+
+    async def _stop(self, proc: asyncio.subprocess.Process, exited: asyncio.Task):
+        """SIGTERM Cline's process group, then SIGKILL whatever is left."""
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            await exited
+            return
+        stop_by = time.monotonic() + _KILL_GRACE_SECONDS
+        while time.monotonic() < stop_by:
+            await asyncio.wait({exited}, timeout=0.1)
+            if exited.done() and not _group_alive(proc.pid):
+                return
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        await exited
+
+
+def _group_alive(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
@@ -0,0 +1,200 @@
+"""
+workdirs.py - Pre-warmed working copies of the Remotion project for agentic renders.
+
+Cline edits its working copy freely, so each job needs private copies of the
+template's files. Files are cloned with reflinks (FICLONE) where the
+filesystem supports them, which costs no data I/O, and copied otherwise.
+They are never hardlinked, because Cline and curl rewrite files in place
+and would write through to the template. node_modules is symlinked as before.
+
+A small pool of clones is kept ready, so a job only pays for a rename.
+Finished work dirs are renamed aside and deleted in the background, and
+the pool refills in the background too. Clones of an older template are
+discarded when the template changes.
+
+Several API workers can share WORKDIR_ROOT, so each process keeps its
+clones and trash under its own proc-{pid}/ directory. At startup a process
+only reaps the directories of processes that are no longer running.
+"""
+
+import os
+import uuid
+import shutil
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import reflink_or_copy
+
+# Under home to avoid shell spawn issues in deep /var/folders paths
+WORKDIR_ROOT = os.path.expanduser("~/.remotion-agentic")
+# Ready-to-use clones kept per template
+WORKDIR_POOL_SIZE = int(os.environ.get("WORKDIR_POOL_SIZE", "2"))
+
+_IGNORED = {"node_modules", "out", ".git"}
+_PROC_PREFIX = "proc-"
+_POOL_PREFIX = "pool-"
+_TRASH_PREFIX = ".trash-"
+# This process's clones and trash
+_PROC_DIR = os.path.join(WORKDIR_ROOT, f"{_PROC_PREFIX}{os.getpid()}")
+
+_lock = threading.Lock()
+# (template signature, path) of ready clones
+_ready: deque[tuple[str, str]] = deque()
+_filling = 0
+_started = False
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="workdirs")
+
+
+def acquire(source_dir: str, job_id: str) -> str:
+    """
+    Working copy of source_dir at WORKDIR_ROOT/work-{job_id}, taken from the
+    pool when one is ready. Blocking; the pool is refilled in the background.
+    """
+    _start()
+    signature = _signature(source_dir)
+    work_dir = os.path.join(WORKDIR_ROOT, f"work-{job_id}")
+    if os.path.lexists(work_dir):
+        release(work_dir)
+
+    ready = _take(signature)
+    if ready is not None:
+        try:
+            os.rename(ready, work_dir)
+            print(f"[agentic] Using pre-warmed working copy at {work_dir}")
+        except OSError as e:
+            print(f"[agentic] Warning: pre-warmed working copy unusable ({e}), cloning instead")
+            shutil.rmtree(ready, ignore_errors=True)
+            ready = None
+    if ready is None:
+        print(f"[agentic] Creating working copy at {work_dir}...")
+        _clone(source_dir, work_dir)
+
+    _refill(source_dir, signature)
+    return work_dir
+
+
+def warm(source_dir: str):
+    """Start filling the pool for source_dir, e.g. at startup."""
+    if not os.path.isdir(source_dir):
+        return
+    _start()
+    _refill(source_dir, _signature(source_dir))
+
+
+def release(work_dir: str):
+    """Rename a finished work dir aside and delete it in the background."""
+    trash = os.path.join(_PROC_DIR, f"{_TRASH_PREFIX}{uuid.uuid4().hex}")
+    os.rename(work_dir, trash)
+    _background.submit(shutil.rmtree, trash, True)
+
+
+def _start():
+    """Create this process's directory, and reap those of processes that have exited."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    os.makedirs(WORKDIR_ROOT, exist_ok=True)
+    for name in os.listdir(WORKDIR_ROOT):
+        if name.startswith(_TRASH_PREFIX):
+            # Left by a reap that didn't finish; nobody else uses it
+            _background.submit(shutil.rmtree, os.path.join(WORKDIR_ROOT, name), True)
+            continue
+        if not name.startswith(_PROC_PREFIX):
+            continue
+        pid = name[len(_PROC_PREFIX):]
+        # Our own pid here means a dead process's pid was reused
+        if pid.isdigit() and (int(pid) == os.getpid() or not _process_alive(int(pid))):
+            stale = os.path.join(WORKDIR_ROOT, f"{_TRASH_PREFIX}{uuid.uuid4().hex}")
+            try:
+                os.rename(os.path.join(WORKDIR_ROOT, name), stale)
+            except OSError:
+                continue  # Another process is reaping it
+            _background.submit(shutil.rmtree, stale, True)
+    os.makedirs(_PROC_DIR, exist_ok=True)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _take(signature: str) -> str | None:
+    while True:
+        with _lock:
+            if not _ready:
+                return None
+            ready_signature, path = _ready.popleft()
+        if ready_signature == signature:
+            return path
+        release(path)
+
+
+def _refill(source_dir: str, signature: str):
+    global _filling
+    with _lock:
+        needed = WORKDIR_POOL_SIZE - len(_ready) - _filling
+        _filling += max(0, needed)
+    for _ in range(needed):
+        _background.submit(_fill, source_dir, signature)
+
+
+def _fill(source_dir: str, signature: str):
+    global _filling
+    path = os.path.join(_PROC_DIR, f"{_POOL_PREFIX}{uuid.uuid4().hex}")
+    try:
+        _clone(source_dir, path)
+    except Exception as e:
+        print(f"[agentic] Warning: could not pre-warm a working copy: {e}")
+        shutil.rmtree(path, ignore_errors=True)
+        path = None
+    with _lock:
+        _filling -= 1
+        if path is not None:
+            _ready.append((signature, path))
+
+
+def _signature(source_dir: str) -> str:
+    """Cheap fingerprint of the template: every file's path, size and mtime."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if d not in _IGNORED)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                st = os.lstat(path)
+            except FileNotFoundError:
+                continue
+            digest.update(f"{os.path.relpath(path, source_dir)}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def _clone(source_dir: str, dest: str):
+    """Clone the template (minus node_modules, out/ and .git) to dest."""
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if d not in _IGNORED]
+        target = os.path.normpath(os.path.join(dest, os.path.relpath(root, source_dir)))
+        os.makedirs(target, exist_ok=True)
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            src = os.path.join(root, name)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), os.path.join(target, name))
+            else:
+                _clone_file(src, os.path.join(target, name))
+
+    # Share the template's node_modules instead of re-installing
+    os.symlink(os.path.join(source_dir, "node_modules"), os.path.join(dest, "node_modules"))
+    os.makedirs(os.path.join(dest, "out"), exist_ok=True)
+
+
+def _clone_file(src: str, dest: str):
+    reflink_or_copy(src, dest)
+    shutil.copystat(src, dest)
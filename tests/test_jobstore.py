@@ -0,0 +1,127 @@
+import os
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from src.jobstore import SQLiteJobStore
+
+
+class SQLiteJobStoreFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "jobs.db")
+        # Long interval: only the test flushes
+        self.store = SQLiteJobStore(path=self.path, flush_interval=3600)
+        self.store._conn.execute("PRAGMA busy_timeout=50")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def _stored(self, job_id):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def test_locked_database_keeps_pending_updates(self):
+        self.store.create("job", {"status": "processing"})
+        self.store.flush()
+
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            self.store.update("job", status="rendering", stage_detail="Rendering frames 10/600")
+            with self.assertRaises(sqlite3.OperationalError):
+                self.store.flush()
+            self.assertFalse(self.store._conn.in_transaction)
+            # Still visible locally while the database is locked
+            self.assertEqual(self.store.get("job")["status"], "rendering")
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+        self.store.flush()
+        self.assertEqual(self._stored("job"), ("rendering",))
+        self.assertEqual(self.store.get("job")["stage_detail"], "Rendering frames 10/600")
+
+    def test_callers_do_not_wait_on_a_locked_database(self):
+        self.store.create("job", {"status": "processing"})
+        self.store.flush()
+        self.store._conn.execute("PRAGMA busy_timeout=2000")
+
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            self.store.update("job", stage_detail="Rendering frames 10/600")
+            errors = []
+
+            def flush():
+                try:
+                    self.store.flush()
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+
+            flusher = threading.Thread(target=flush)
+            flusher.start()
+            time.sleep(0.1)
+
+            started = time.monotonic()
+            self.store.create("other", {"status": "processing"})
+            self.store.update("job", status="completed")
+            job = self.store.get("job")
+            self.assertLess(time.monotonic() - started, 0.5)
+            self.assertEqual(job["status"], "completed")
+            self.assertEqual(job["stage_detail"], "Rendering frames 10/600")
+            self.assertEqual(self.store.get("other")["status"], "processing")
+            flusher.join()
+            self.assertEqual(len(errors), 1)
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+        self.store.flush()
+        self.assertEqual(self._stored("job"), ("completed",))
+        self.assertEqual(self._stored("other"), ("processing",))
+
+    def test_delete_before_flush(self):
+        self.store.create("job", {"status": "processing"})
+        self.store.delete("job")
+        self.assertIsNone(self.store.get("job"))
+        self.store.flush()
+        self.assertIsNone(self._stored("job"))
+
+    def test_recover_interrupted_fails_jobs_of_dead_workers(self):
+        dead = subprocess.Popen([sys.executable, "-c", ""])
+        dead.wait()
+        self.store.create("mine", {"status": "processing"})
+        self.store.create("batch", {"status": "processing", "job_ids": ["orphan"]})
+        self.store.create("orphan", {"status": "processing", "batch_id": "batch"})
+        self.store.flush()
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            for job_id in ("batch", "orphan"):
+                data = json.loads(conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0])
+                data["owner"] = dead.pid
+                conn.execute("UPDATE jobs SET data = ? WHERE job_id = ?", (json.dumps(data), job_id))
+            # A live worker's jobs are left alone
+            data = json.loads(conn.execute("SELECT data FROM jobs WHERE job_id = 'mine'").fetchone()[0])
+            data["owner"] = os.getppid()
+            conn.execute("UPDATE jobs SET data = ? WHERE job_id = 'mine'", (json.dumps(data),))
+        finally:
+            conn.close()
+
+        self.assertEqual(self.store.recover_interrupted(), 1)
+        self.assertEqual(self.store.get("orphan")["status"], "failed")
+        self.assertEqual(self.store.get("batch")["status"], "completed")
+        self.assertEqual(self.store.get("mine")["status"], "processing")
+
+
+if __name__ == "__main__":
+    unittest.main()